@@ -1,59 +1,137 @@
-from .iris import create_iris_agent
-from .mnemosyne import create_mnemosyne_agent
-from .ares import create_ares_agent
-from .hera import create_hera_agent
-from .demeter import create_demeter_agent
-from .apollo import create_apollo_agent
-from .calliope import create_calliope_agent
-from .plutus import create_plutus_agent
-from .tyche import create_tyche_agent
-from .orpheus import create_orpheus_agent
-from .hestia import create_hestia_agent
-from .dike import create_dike_agent
-from .eirene import create_eirene_agent
-from .themis import create_themis_agent
-from .zeus import create_zeus_agent
-from autogen import AssistantAgent, UserProxyAgent
-from config import config_list_from_model
 import os
 import logging
-from dotenv import load_dotenv
-from autogen import AssistantAgent, UserProxyAgent
+import functools
+import importlib
+from collections.abc import Mapping
+from autogen import UserProxyAgent
+from env import load_env
+from clients import shared_http_client
 
 # Configure logging
 logger = logging.getLogger("insurance_agents")
-# Read the specific deployment name for o1-mini from environment variables
-# Load environment variables from x1.env - ADD THIS LINE
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), "x1.env"))
 
-o1mini_deployment_name = os.getenv("AZURE_OPENAI_O1MINI_DEPLOYMENT")
+# Load environment variables from x1.env (parsed once per process)
+load_env(os.path.join(os.path.dirname(os.path.dirname(__file__)), "x1.env"))
 
-if not o1mini_deployment_name:
-    # Handle error or log a warning if the deployment name isn't set
-    print("WARNING: AZURE_OPENAI_O1MINI_DEPLOYMENT environment variable not set. Demeter agent may fail.")
-    # You might want to raise an error or use a default/fallback if appropriate
-    o1mini_deployment_name = "o1-mini" # Fallback to potentially incorrect name, but log warning
+# --- Agent Creation ---
 
-demeter_config_list = [{
-    "model": o1mini_deployment_name, # <-- Use the variable holding the deployment name
-    "api_key": os.getenv("AZURE_OPENAI_API_KEY_X1"),
-    "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
-    "api_version": os.getenv("AZURE_OPENAI_API_VERSION"), # Read version from env
-    "api_type": "azure"
-}]
+# Azure OpenAI settings are read once at import rather than on every initialize_agents() call
+_AZURE_API_KEY = os.getenv("AZURE_OPENAI_API_KEY_X1")
+_AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+_AZURE_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+_AZURE_GPT4O_DEPLOYMENT = os.getenv("AZURE_OPENAI_GPT4O_DEPLOYMENT")
+_AZURE_O1MINI_DEPLOYMENT = os.getenv("AZURE_OPENAI_O1MINI_DEPLOYMENT")
 
+def _build_config_list(deployment):
+    """Build an AutoGen config list for the given Azure OpenAI deployment."""
+    return ({
+        "model": deployment,
+        "api_key": _AZURE_API_KEY,
+        "base_url": _AZURE_ENDPOINT,
+        "api_version": _AZURE_API_VERSION,
+        "api_type": "azure",
+        "http_client": shared_http_client
+    },)
 
-# --- Agent Creation ---
-import os
-import logging
-from dotenv import load_dotenv
-from autogen import AssistantAgent, UserProxyAgent
+# Common configuration for GPT-4o agents, reused across initialize_agents() calls
+gpt4o_config_list = _build_config_list(_AZURE_GPT4O_DEPLOYMENT or "gpt-4o")
 
-# Configure logging
-logger = logging.getLogger("insurance_agents")
+# Configuration for Demeter agent (using o1-mini)
+demeter_config_list = _build_config_list(_AZURE_O1MINI_DEPLOYMENT or "o1-mini")
+
+# llm_config wrapper shared by every agent instead of one dict literal per agent
+_GPT4O_LLM_CONFIG = {"config_list": gpt4o_config_list}
+
+# Agents built from an llm_config; Demeter shares the GPT-4o config, as before.
+# Each name maps to agents/<name>.py and its create_<name>_agent factory.
+_LLM_AGENT_NAMES = (
+    "iris", "mnemosyne", "ares", "apollo", "calliope", "plutus", "tyche",
+    "orpheus", "hestia", "dike", "eirene", "themis", "zeus", "demeter"
+)
+
+def _load_factory(name):
+    """Import agents.<name> on demand and return its create_<name>_agent factory."""
+    module = importlib.import_module(f".{name}", __package__)
+    return getattr(module, f"create_{name}_agent")
 
-# Load environment variables from x1.env
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), "x1.env"))
+def _create_agent(name, **kwargs):
+    """Build the named agent, importing its module only when it is first needed."""
+    return _load_factory(name)(**kwargs)
+
+def __getattr__(attr):
+    """Resolve create_<name>_agent package attributes lazily."""
+    name = attr[len("create_"):-len("_agent")]
+    if attr.startswith("create_") and attr.endswith("_agent") and name in _LLM_AGENT_NAMES + ("hera",):
+        return _load_factory(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
+
+def _is_terminate(msg):
+    """Return True when a message ends the conversation with TERMINATE."""
+    return (msg.get("content") or "").rstrip().endswith("TERMINATE")
+
+def _create_user_proxy():
+    """Create the user proxy agent that relays messages without human input."""
+    return UserProxyAgent(
+        "user_proxy",
+        human_input_mode="NEVER",
+        max_consecutive_auto_reply=10,
+        is_termination_msg=_is_terminate,
+        code_execution_config=False
+    )
+
+class AgentHandle:
+    """
+    Slim placeholder for an agent that is only constructed on first use.
+    
+    Attribute access other than the slots below is forwarded to the underlying
+    agent, which is built by the factory the first time it is needed.
+    """
+    
+    __slots__ = ("name", "_factory", "_instance")
+    
+    def __init__(self, name, _factory):
+        self.name = name
+        self._factory = _factory
+        self._instance = None
+    
+    def resolve(self):
+        """Return the underlying agent, constructing it on first call."""
+        if self._instance is None:
+            self._instance = self._factory()
+            logger.debug("Constructed agent '%s' on first access", self.name)
+        return self._instance
+    
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+class LazyAgentRegistry(Mapping):
+    """
+    Read-only mapping of agent name to agent instance.
+    
+    Each entry is an AgentHandle, so a workflow only pays construction cost
+    for the agents it actually uses.
+    """
+    
+    def __init__(self, factories):
+        self._handles = {
+            name: AgentHandle(name=name, _factory=factory)
+            for name, factory in factories.items()
+        }
+    
+    def __getitem__(self, name):
+        # Raises KeyError for unknown agents, same as the plain dict did.
+        # The real agent is returned because AutoGen type-checks chat recipients.
+        return self._handles[name].resolve()
+    
+    def __iter__(self):
+        return iter(self._handles)
+    
+    def __len__(self):
+        return len(self._handles)
+    
+    def handle(self, name):
+        """Return the AgentHandle for name without constructing the agent."""
+        return self._handles[name]
 
 def initialize_agents(model=None):
     """
@@ -63,74 +141,37 @@ def initialize_agents(model=None):
         model (str, optional): The model deployment name to use. If None, uses the value from environment.
         
     Returns:
-        dict: Dictionary of initialized agents
+        LazyAgentRegistry: Mapping of agent name to agent, built on first access
     """
-    # Get deployment names from environment variables or use provided model
-    gpt4o_deployment = model or os.getenv("AZURE_OPENAI_GPT4O_DEPLOYMENT")
-    o1mini_deployment_name = os.getenv("AZURE_OPENAI_O1MINI_DEPLOYMENT")
+    # Get deployment names from the cached environment values or use provided model
+    gpt4o_deployment = model or _AZURE_GPT4O_DEPLOYMENT
     
     if not gpt4o_deployment:
         logger.warning("No GPT-4o deployment specified - using default 'gpt-4o'")
         gpt4o_deployment = "gpt-4o"  # Fallback name
     
-    if not o1mini_deployment_name:
+    if not _AZURE_O1MINI_DEPLOYMENT:
         logger.warning("AZURE_OPENAI_O1MINI_DEPLOYMENT environment variable not set. Demeter agent may fail.")
-        o1mini_deployment_name = "o1-mini"  # Fallback name, but this will likely cause a 404 error
     
     # Log the deployment names being used
-    logger.info(f"Initializing agents with GPT-4o deployment: {gpt4o_deployment}")
-    logger.info(f"Demeter will use o1-mini deployment: {o1mini_deployment_name}")
-    
-    # Common configuration for GPT-4o agents
-    gpt4o_config_list = [{
-        "model": gpt4o_deployment,
-        "api_key": os.getenv("AZURE_OPENAI_API_KEY_X1"),
-        "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
-        "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-        "api_type": "azure"
-    }]
-    
-    # Configuration for Demeter agent (using o1-mini)
-    demeter_config_list = [{
-        "model": o1mini_deployment_name,  # Using the environment variable for o1-mini
-        "api_key": os.getenv("AZURE_OPENAI_API_KEY_X1"),
-        "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
-        "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-        "api_type": "azure"
-    }]
-    
-    # Initialize all agents
-    agents = {
-        # Primary agents using GPT-4o
-        "iris": AssistantAgent("iris", llm_config={"config_list": gpt4o_config_list}),
-        "mnemosyne": AssistantAgent("mnemosyne", llm_config={"config_list": gpt4o_config_list}),
-        "ares": AssistantAgent("ares", llm_config={"config_list": gpt4o_config_list}),
-        "hera": AssistantAgent("hera", llm_config={"config_list": gpt4o_config_list}),
-        "apollo": AssistantAgent("apollo", llm_config={"config_list": gpt4o_config_list}),
-        "calliope": AssistantAgent("calliope", llm_config={"config_list": gpt4o_config_list}),
-        "plutus": AssistantAgent("plutus", llm_config={"config_list": gpt4o_config_list}),
-        "tyche": AssistantAgent("tyche", llm_config={"config_list": gpt4o_config_list}),
-        "orpheus": AssistantAgent("orpheus", llm_config={"config_list": gpt4o_config_list}),
-        "hestia": AssistantAgent("hestia", llm_config={"config_list": gpt4o_config_list}),
-        "dike": AssistantAgent("dike", llm_config={"config_list": gpt4o_config_list}),
-        "eirene": AssistantAgent("eirene", llm_config={"config_list": gpt4o_config_list}),
-        "themis": AssistantAgent("themis", llm_config={"config_list": gpt4o_config_list}),
-        "zeus": AssistantAgent("zeus", llm_config={"config_list": gpt4o_config_list}),
-        
-        # Demeter using o1-mini via separate config
-        "demeter": AssistantAgent("demeter", llm_config={"config_list": gpt4o_config_list}),
-        
-        # User proxy agent
-        "user_proxy": UserProxyAgent(
-            "user_proxy",
-            human_input_mode="NEVER",
-            max_consecutive_auto_reply=10,
-            is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
-            code_execution_config=False
-        )
+    logger.info("Initializing agents with GPT-4o deployment: %s", gpt4o_deployment)
+    logger.info("Demeter will use o1-mini deployment: %s", demeter_config_list[0]["model"])
+    
+    # Only build a new config when the caller overrides the deployment
+    llm_config = _GPT4O_LLM_CONFIG
+    if gpt4o_deployment != gpt4o_config_list[0]["model"]:
+        llm_config = {"config_list": _build_config_list(gpt4o_deployment)}
+    
+    # Register the per-agent factories, which carry each agent's system message;
+    # each agent is only constructed on first access
+    factories = {
+        name: functools.partial(_create_agent, name, llm_config=llm_config)
+        for name in _LLM_AGENT_NAMES
     }
+    factories["hera"] = functools.partial(_create_agent, "hera")
+    factories["user_proxy"] = _create_user_proxy
+    agents = LazyAgentRegistry(factories)
     
     logger.info("Agents initialized successfully")
-    print("Agents initialized successfully")
     return agents        
 # You might call initialize_agents() elsewhere in your app startup
\ No newline at end of file
@@ -1,27 +1,25 @@
 import os
-from autogen import AssistantAgent, config_list_from_json
+from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-# Import Hera agent for recommendations with correct class name
-from agents.hera import HeraAgent
+# Hera is created on first use so importing Ares does not pull in customerprofile
+_hera_agent_singleton = None
 
-# Initialize Hera when needed with correct class name
-hera_agent = HeraAgent()
+def _get_hera():
+    """Return the shared HeraAgent, creating it on first call."""
+    global _hera_agent_singleton
+    if _hera_agent_singleton is None:
+        from agents.hera import create_hera_agent
+        _hera_agent_singleton = create_hera_agent()
+    return _hera_agent_singleton
 
-def create_ares_agent():
-    """
-    Creates and returns the Ares risk assessment agent using Azure OpenAI.
-    
-    Follows Azure best practices for agent initialization and configuration.
-    
-    Returns:
-        AssistantAgent: The configured Ares agent
-    """
-    # Use environment variables with fallbacks for Azure configuration
-    azure_deployment = os.getenv("AZURE_OPENAI_GPT4O_DEPLOYMENT", "gpt-4o")
-    
-    # Define the Ares agent system message
-    system_message = """You are Ares, an insurance risk assessment specialist agent.
+# Azure deployment name, read once at import instead of on every agent creation
+AZURE_DEPLOYMENT = os.getenv("AZURE_OPENAI_GPT4O_DEPLOYMENT", "gpt-4o")
+
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = """You are Ares, an insurance risk assessment specialist agent.
     
     Your responsibilities:
     1. Analyze customer profiles for risk factors
@@ -32,16 +30,28 @@ def create_ares_agent():
     
     Always consider both standard risk factors and edge cases in your assessments.
     """
+
+def create_ares_agent(llm_config=None):
+    """
+    Creates and returns the Ares risk assessment agent using Azure OpenAI.
+    
+    Follows Azure best practices for agent initialization and configuration.
+    
+    Args:
+        llm_config (dict, optional): Base AutoGen llm_config. Defaults to the GPT-4o config list.
     
+    Returns:
+        AssistantAgent: The configured Ares agent
+    """
     # Create the Ares agent with proper Azure OpenAI configuration
     ares_agent = AssistantAgent(
         name="Ares",
-        system_message=system_message,
+        system_message=_SYSTEM_MESSAGE,
         llm_config={
-            "config_list": config_list_gpt4o,
+            **(llm_config or _LLM_CONFIG),
             "temperature": 0.2,  # Lower temperature for more consistent risk assessment
             "timeout": 60,  # Set reasonable timeout for Azure API calls
-            "azure_deployment": azure_deployment
+            "azure_deployment": AZURE_DEPLOYMENT
         }
     )
     
@@ -53,7 +63,7 @@ def get_recommendations(customer_data):
     Get insurance recommendations based on customer risk profile
     """
     # Use the correct source identifier for Ares
-    result = hera_agent.get_recommendations(customer_data, source="ares")
+    result = _get_hera().get_recommendations(customer_data, source="ares")
     return result
 
 # Expose any additional functions needed for the Ares workflow
@@ -62,11 +72,14 @@ def analyze_risk_factors(customer_data):
     Analyze specific risk factors in customer data
     
     Args:
-        customer_data (dict): Customer profile data
+        customer_data (dict or list[dict]): Customer profile data, or a batch of profiles
         
     Returns:
-        dict: Detailed risk factor analysis
+        dict or list[dict]: Detailed risk factor analysis, one per customer for a batch
     """
+    if not isinstance(customer_data, dict):
+        return [analyze_risk_factors(customer) for customer in customer_data]
+    
     # This would use the Ares agent or internal logic to analyze risks
     # For now, this is a placeholder
     return {
@@ -91,4 +104,4 @@ def calculate_vehicle_risk(customer_data):
 def calculate_location_risk(customer_data):
     """Calculate location-based risk factors using H3 indices"""
     # Implementation would go here
-    return "medium"
\ No newline at end of file
+    return "medium"
@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_calliope_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Calliope. Refine and polish the policy draft into a finalized document."
+
+def create_calliope_agent(llm_config=None):
     """Create and return the Calliope (Document Drafting) agent"""
     return AssistantAgent(
         name="Calliope (DocumentDraftingAgent)",
-        system_message="You are Calliope. Refine and polish the policy draft into a finalized document.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
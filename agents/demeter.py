@@ -1,11 +1,11 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_demeter_agent():
-    """Create and return the Demeter (Coverage Model) agent"""
-    return AssistantAgent(
-        name="Demeter (CoverageModelAgent)",
-        system_message="""
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+# System prompt, shared by every factory call
+_SYSTEM_MESSAGE = """
 You are DEMETER, the coverage modeling agent in the insurance policy workflow.
 
 Your job is to:
@@ -23,6 +23,12 @@ Always return your response in clean JSON format with the following structure:
     "exclusions": ["list", "of", "exclusions"],
     "addOns": ["list", "of", "recommended", "add-ons"]
 }
-""",
-        llm_config={"config_list": config_list_gpt4o}
+"""
+
+def create_demeter_agent(llm_config=None):
+    """Create and return the Demeter (Coverage Model) agent"""
+    return AssistantAgent(
+        name="Demeter (CoverageModelAgent)",
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_eirene_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Eirene. Finalize the issuance of policies and assign policy numbers."
+
+def create_eirene_agent(llm_config=None):
     """Create and return the Eirene (Issuance) agent"""
     return AssistantAgent(
         name="Eirene (IssuanceAgent)",
-        system_message="You are Eirene. Finalize the issuance of policies and assign policy numbers.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
@@ -1,11 +1,14 @@
+import functools
 import logging
-import uuid
+import secrets
 import os
-from customerprofile import call_customerprofile
+from customerprofile import run as _profile_run
 
 # Azure Best Practice: Configure module-level logger with Azure Monitor integration
 logger = logging.getLogger(__name__)
 
+# Expected failures from the customer profile lookup, logged without a traceback
+_EXPECTED_ERRORS = (KeyError, ConnectionError, TimeoutError)
 
 
 class HeraAgent:
@@ -15,7 +18,6 @@ class HeraAgent:
   
     def __init__(self):
         # Azure Best Practice: Use module-level logger, not self.logger
-        logger.info("Starting customer profile processing")
         logger.info("HeraAgent initialized")
                          
     def get_recommendations(self, customer_data, source="iris"):
@@ -23,28 +25,28 @@ class HeraAgent:
         Receives customer data from IRIS, calls customerprofile.py, and returns only the top 3 recommended coverages.
         """
         # Azure Best Practice: Add correlation ID for request tracing
-        correlation_id = str(uuid.uuid4())
+        correlation_id = secrets.token_hex(16)
+        log_prefix = f"[HERA - {source.upper()}][{correlation_id}]"
         
         try:
             # Use module-level logger, not self.logger
-            logger.info(f"[HERA - {source.upper()}][{correlation_id}] Calling customerprofile.py")
+            logger.info("%s Calling customerprofile.py", log_prefix)
             
-            # Call customerprofile.py directly with the data as-is
-            profile_result = call_customerprofile(customer_data)
+            # Call customerprofile in-process with the data as-is
+            profile_result = _profile_run(customer_data)
 
             # Extract only the coverages from the top 3 closest policies
             top_policies = profile_result.get("TOP_3_CLOSEST_POLICIES", [])
-            recommended_coverages = []
-
-            for policy in top_policies:
-                coverage_entry = {
+            recommended_coverages = [
+                {
                     "coverages": policy.get("coverages", []),
                     "limits": policy.get("limits", {}),
                     "deductibles": policy.get("deductibles", {}),
                     "addOns": policy.get("addOns", []),
                     "premium": policy.get("premium")
                 }
-                recommended_coverages.append(coverage_entry)
+                for policy in top_policies
+            ]
 
             result = {
                 "source": source,
@@ -55,25 +57,55 @@ class HeraAgent:
             }
 
             # Use module-level logger, not self.logger
-            logger.info(f"[HERA - {source.upper()}][{correlation_id}] Successfully retrieved recommendations")
+            logger.info("%s Successfully retrieved recommendations", log_prefix)
             return result
 
+        except _EXPECTED_ERRORS as e:
+            # Known failure modes: the message is enough, skip building a traceback
+            logger.error("%s Error: %s", log_prefix, e)
+            error = e
         except Exception as e:
             # Azure Best Practice: Include exc_info for better diagnostics
-            logger.error(f"[HERA - {source.upper()}][{correlation_id}] Error: {str(e)}", exc_info=True)
-            return {
-                "source": source,
-                "error": str(e),
-                "recommended_coverages": [],
-                "next_agent": "Mnemosyne",
-                "proceed": True,
-                "correlation_id": correlation_id
-            }
+            logger.error("%s Error: %s", log_prefix, e, exc_info=True)
+            error = e
+
+        return {
+            "source": source,
+            "error": str(error),
+            "recommended_coverages": [],
+            "next_agent": "Mnemosyne",
+            "proceed": True,
+            "correlation_id": correlation_id
+        }
+
+# Per-stage payload builders: each stage sends Hera only the state it needs. The
+# stage itself stays out of the payload (it is passed to Hera separately), so the
+# same customer yields the same extraction and embedding cache keys at every stage.
+_STAGE_FORMATTERS = {
+    "iris": lambda d: {"customerProfile": d.get("customerProfile", {})},
+    "mnemosyne": lambda d: {"customerProfile": d.get("customerProfile", {})},
+    "underwriting": lambda d: {"customerProfile": d.get("customerProfile", {})},
+    "ares": lambda d: {
+        "customerProfile": d.get("customerProfile", {}),
+        "riskAssessment": d.get("risk_info", {})
+    },
+}
+
+def _identity(data):
+    return data
+
+def format_data_for_stage(data, stage):
+    """Shape workflow state for Hera at the given stage; unknown stages pass through."""
+    return _STAGE_FORMATTERS.get(stage.lower(), _identity)(data)
 
 # Factory function to create HeraAgent instance (remove duplicate definition)
+@functools.lru_cache(maxsize=1)
 def create_hera_agent():
     """
-    Factory function to create a HeraAgent instance.
+    Factory function returning the shared HeraAgent instance.
+    
+    HeraAgent keeps no per-call state, so one instance is created per process
+    and reused by every caller.
     """
     return HeraAgent()
 
@@ -81,17 +113,23 @@ def get_profile_recommendations(customer_data, workflow_stage="iris"):
     """
     Wrapper function to get recommendations from HeraAgent.
     """
+    log_prefix = f"[HERA - {workflow_stage.upper()}]"
     # Use module-level logger, not self.logger
-    logger.info(f"[HERA - {workflow_stage.upper()}] Processing customer data...")
+    logger.info("%s Processing customer data...", log_prefix)
     try:
         agent = create_hera_agent()
         return agent.get_recommendations(customer_data, source=workflow_stage)
+    except _EXPECTED_ERRORS as e:
+        # Known failure modes: the message is enough, skip building a traceback
+        logger.error("%s Error: %s", log_prefix, e)
+        error = e
     except Exception as e:
         # Azure Best Practice: Include exc_info for better diagnostics
-        logger.error(f"[HERA - {workflow_stage.upper()}] Error: {str(e)}", exc_info=True)
-        return {
-            "source": workflow_stage,
-            "error": str(e),
-            "recommended_coverages": [],
-            "proceed": True
-        }
\ No newline at end of file
+        logger.error("%s Error: %s", log_prefix, e, exc_info=True)
+        error = e
+    return {
+        "source": workflow_stage,
+        "error": str(error),
+        "recommended_coverages": [],
+        "proceed": True
+    }
@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_hestia_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Hestia. Conduct internal reviews and approve finalized policy drafts."
+
+def create_hestia_agent(llm_config=None):
     """Create and return the Hestia (Internal Approval) agent"""
     return AssistantAgent(
         name="Hestia (InternalApprovalAgent)",
-        system_message="You are Hestia. Conduct internal reviews and approve finalized policy drafts.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
@@ -4,7 +4,7 @@ import uuid
 import os
 from autogen import AssistantAgent
 from config import config_list_gpt4o
-from agents.hera import HeraAgent
+from agents.hera import create_hera_agent
 
 # Azure Best Practice: Configure module-level logger with consistent naming
 logger = logging.getLogger(__name__)
@@ -15,34 +15,35 @@ class IrisAgent:
     IrisAgent processes customer data and coordinates with other agents in the workflow.
     """
     def __init__(self):
-        # Azure Best Practice: Generate correlation ID for request tracing
-        self.correlation_id = str(uuid.uuid4())
-        self.hera_agent = HeraAgent()
+        # Share the process-wide Hera instance
+        self.hera_agent = create_hera_agent()
         # Use module-level logger, not self.logger
-        logger.info(f"[IRIS][{self.correlation_id}] IrisAgent initialized")
+        logger.info("[IRIS] IrisAgent initialized")
 
-    def process_customer_data(self, customer_data):
+    def process_customer_data(self, customer_data, correlation_id=None):
         """Process customer data and get recommendations from Hera"""
+        # Azure Best Practice: Generate correlation ID per request for tracing
+        correlation_id = correlation_id or str(uuid.uuid4())
         try:
             # Call Hera to get recommendations
-            logger.info(f"[IRIS][{self.correlation_id}] Requesting recommendations from Hera agent")
+            logger.info("[IRIS][%s] Requesting recommendations from Hera agent", correlation_id)
             hera_response = self.hera_agent.get_recommendations(customer_data, source="iris")
             
             # Process and display Hera's response
-            self.process_hera_response(hera_response)
+            self.process_hera_response(hera_response, correlation_id)
             
             return hera_response
         except Exception as e:
             # Azure Best Practice: Include exc_info for better diagnostics
-            logger.error(f"[IRIS][{self.correlation_id}] Error processing customer data: {str(e)}", exc_info=True)
-            return {"error": str(e), "correlation_id": self.correlation_id}
+            logger.error("[IRIS][%s] Error processing customer data: %s", correlation_id, e, exc_info=True)
+            return {"error": str(e), "correlation_id": correlation_id}
 
-    def process_hera_response(self, hera_response):
+    def process_hera_response(self, hera_response, correlation_id=None):
         """Process and display the recommendations from Hera"""
         try:
             # Check for recommended_coverages in response
             if "recommended_coverages" in hera_response and hera_response["recommended_coverages"]:
-                logger.info(f"[IRIS][{self.correlation_id}] Processing {len(hera_response['recommended_coverages'])} coverage recommendations")
+                logger.info("[IRIS][%s] Processing %d coverage recommendations", correlation_id, len(hera_response["recommended_coverages"]))
                 print("\n=== RECOMMENDED COVERAGES ===")
                 for idx, coverage in enumerate(hera_response["recommended_coverages"], 1):
                     print(f"\nOption {idx}:")
@@ -60,31 +61,45 @@ class IrisAgent:
                         print(f"  Premium: ${coverage['premium']:.2f}")
                 print("\n")
             else:
-                logger.warning(f"[IRIS][{self.correlation_id}] No coverage recommendations available")
+                logger.warning("[IRIS][%s] No coverage recommendations available", correlation_id)
                 print("\nNo coverage recommendations available")
         except Exception as e:
             # Azure Best Practice: Include exc_info for better diagnostics
-            logger.error(f"[IRIS][{self.correlation_id}] Error processing Hera response: {str(e)}", exc_info=True)
+            logger.error("[IRIS][%s] Error processing Hera response: %s", correlation_id, e, exc_info=True)
             print("\nError displaying recommendations")
 
+# Shared IrisAgent, created on first use
+_IRIS_SINGLETON = None
+
+def _get_iris():
+    """Return the shared IrisAgent, creating it on first call."""
+    global _IRIS_SINGLETON
+    if _IRIS_SINGLETON is None:
+        _IRIS_SINGLETON = IrisAgent()
+    return _IRIS_SINGLETON
+
 # Create a wrapper function to maintain backward compatibility
 def present_recommendations_to_user(customer_data):
     """Wrapper function to maintain backward compatibility"""
     # Azure Best Practice: Log operations at appropriate places
     logger.info("[IRIS] Starting presentation of recommendations to user")
-    iris = IrisAgent()
-    return iris.process_customer_data(customer_data)
+    return _get_iris().process_customer_data(customer_data)
+
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = """
+You are IRIS, the master planner and coordinator agent for the insurance policy creation workflow.
+[rest of system message...]
+"""
 
 # Create the autogen assistant agent
-def create_iris_agent():
+def create_iris_agent(llm_config=None):
     """Create and return the Iris (Intake) agent"""
     # Azure Best Practice: Log agent creation
     logger.info("[IRIS] Creating Iris autogen agent")
     return AssistantAgent(
         name="Iris (IntakeAgent)",
-        system_message="""
-You are IRIS, the master planner and coordinator agent for the insurance policy creation workflow.
-[rest of system message...]
-""",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
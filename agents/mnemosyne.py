@@ -2,23 +2,19 @@ from autogen import AssistantAgent
 from config import config_list_gpt4o
 import json
 from db.cosmos_db import get_mandatory_questions, save_underwriting_responses
-# Update the import to use the correct class name
-from agents.hera import HeraAgent
-
-# Initialize Hera when needed with correct class name
-hera_agent = HeraAgent()
+from agents.hera import create_hera_agent
 
 # Call Hera with standardized data format
 def get_recommendations(customer_data):
-    # The source parameter identifies which agent is making the call
-    result = hera_agent.get_recommendations(customer_data, source="mnemosyne")
+    # The source parameter identifies which agent is making the call;
+    # Hera is the shared process-wide instance, created on first use
+    result = create_hera_agent().get_recommendations(customer_data, source="mnemosyne")
     return result
 
-def create_mnemosyne_agent():
-    """Create and return the Mnemosyne (Profile) agent"""
-    return AssistantAgent(
-        name="Mnemosyne (ProfileAgent)",
-        system_message="""
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = """
 You are MNEMOSYNE, the profile building agent in the insurance policy workflow.
 
 Your job is to:
@@ -60,6 +56,12 @@ Always return your response in clean JSON format with the following structure:
         "eligibilityReason": "string"
     }
 }
-""",
-        llm_config={"config_list": config_list_gpt4o}
+"""
+
+def create_mnemosyne_agent(llm_config=None):
+    """Create and return the Mnemosyne (Profile) agent"""
+    return AssistantAgent(
+        name="Mnemosyne (ProfileAgent)",
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_orpheus_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Orpheus. Present policy proposals to customers in a persuasive and clear manner."
+
+def create_orpheus_agent(llm_config=None):
     """Create and return the Orpheus (Presentation) agent"""
     return AssistantAgent(
         name="Orpheus (PresentationAgent)",
-        system_message="You are Orpheus. Present policy proposals to customers in a persuasive and clear manner.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
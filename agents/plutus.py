@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_plutus_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Plutus. Compute premium rates using actuarial models and loadings."
+
+def create_plutus_agent(llm_config=None):
     """Create and return the Plutus (Pricing) agent"""
     return AssistantAgent(
         name="Plutus (PricingAgent)",
-        system_message="You are Plutus. Compute premium rates using actuarial models and loadings.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
@@ -1,10 +1,15 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_tyche_agent():
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = "You are Tyche. Generate a detailed, customer-friendly quote based on pricing data."
+
+def create_tyche_agent(llm_config=None):
     """Create and return the Tyche (Quote) agent"""
     return AssistantAgent(
         name="Tyche (QuoteAgent)",
-        system_message="You are Tyche. Generate a detailed, customer-friendly quote based on pricing data.",
-        llm_config={"config_list": config_list_gpt4o}
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
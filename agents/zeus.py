@@ -1,11 +1,10 @@
 from autogen import AssistantAgent
 from config import config_list_gpt4o
 
-def create_zeus_agent():
-    """Create and return the Zeus (Coordinating) agent"""
-    return AssistantAgent(
-        name="Zeus (CoordinatingAgent)",
-        system_message="""
+# Default llm_config, shared by every factory call
+_LLM_CONFIG = {"config_list": config_list_gpt4o}
+
+_SYSTEM_MESSAGE = """
 You are Zeus, the master agent and planner for the insurance policy workflow.
 
 Your responsibilities include:
@@ -32,6 +31,12 @@ Your responsibilities include:
    - Handle any exceptions or deviations from the plan gracefully.
 
 Begin by determining the end-user's intent and proceed accordingly.
-""",
-        llm_config={"config_list": config_list_gpt4o}
+"""
+
+def create_zeus_agent(llm_config=None):
+    """Create and return the Zeus (Coordinating) agent"""
+    return AssistantAgent(
+        name="Zeus (CoordinatingAgent)",
+        system_message=_SYSTEM_MESSAGE,
+        llm_config=llm_config or _LLM_CONFIG
     )
\ No newline at end of file
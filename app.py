@@ -1,45 +1,263 @@
 import os
-from flask import Flask, render_template, request, jsonify, session
+# Outside gunicorn's gevent worker (which patches for us), GEVENT_PATCH_ALL=1 patches
+# blocking socket/ssl I/O before any library below imports them
+if os.getenv("GEVENT_PATCH_ALL") == "1":
+    from gevent import monkey
+    monkey.patch_all()
+from flask import Flask, render_template, request, jsonify, session, make_response
+from flask.json.provider import JSONProvider
 import logging
-import uuid
+import logging.config
+from secrets import token_hex
 import tempfile
 from werkzeug.utils import secure_filename
+from jinja2 import FileSystemBytecodeCache, TemplateNotFound
+from flask_session import Session
+from flask_caching import Cache
+import redis
+import hashlib
+import re
+import functools
+import orjson
 import time
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
+from types import MappingProxyType
+from collections import Counter
+try:
+    from whitenoise import WhiteNoise
+except ImportError:
+    WhiteNoise = None
 from workflow.process import (
     process_insurance_request, 
     handle_policy_change
 )
+# Lookups that workflow.process may not provide yet are resolved on the module at call time
+from workflow import process as _wp
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, which also serializes datetimes and NumPy values natively."""
+    
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self._OPTIONS, default=str).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# Every worker must sign sessions with the same key; the random fallback only
+# suits a single process and invalidates sessions on restart
+app.secret_key = os.getenv("SECRET_KEY") or os.urandom(24)
+# jsonify() responses are encoded with orjson instead of the stdlib json module
+app.json = ORJSONProvider(app)
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Azure best practice: Structured JSON logs for Application Insights / Log Analytics;
+# python-json-logger is optional and the plain text format is used without it
+try:
+    from pythonjsonlogger import jsonlogger
+    _LOG_FORMATTER = {
+        '()': jsonlogger.JsonFormatter,
+        'format': '%(asctime)s %(name)s %(levelname)s %(message)s'
+    }
+except ImportError:
+    _LOG_FORMATTER = {'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'}
+
+logging.config.dictConfig({
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {'default': _LOG_FORMATTER},
+    'handlers': {'console': {'class': 'logging.StreamHandler', 'formatter': 'default'}},
+    'root': {'level': 'INFO', 'handlers': ['console']}
+})
 logger = logging.getLogger(__name__)
 
+# Repeated errors only carry a traceback on the first and every Nth occurrence
+ERROR_TRACEBACK_SAMPLE_RATE = int(os.getenv("ERROR_TRACEBACK_SAMPLE_RATE", "20"))
+_error_counts = Counter()
+
+def _sample_traceback(error, step):
+    """Return True when this occurrence of error at step should log its traceback."""
+    key = f"{type(error).__name__}{step}"
+    _error_counts[key] += 1
+    # A rate of 1 (or less) logs every traceback
+    return (_error_counts[key] - 1) % max(ERROR_TRACEBACK_SAMPLE_RATE, 1) == 0
+
+# Azure best practice: Reject oversized uploads with 413 before the body is parsed;
+# the margin leaves room for the form fields sent alongside the file
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10MB
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES + 1024 * 1024
+
+# Azure best practice: Keep workflow state server-side (e.g. Azure Cache for Redis)
+# so only the session id travels in the cookie. Flask-Session stores the whole
+# session in one msgpack-encoded SET per request, with a TTL of one workflow.
+# Workflow sessions are permanent with this short lifetime, so abandoned workflows expire
+app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(seconds=int(os.getenv("SESSION_TTL_SECONDS", "7200")))
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    app.config["SESSION_TYPE"] = "redis"
+    app.config["SESSION_REDIS"] = redis.Redis(
+        connection_pool=redis.BlockingConnectionPool.from_url(
+            REDIS_URL, max_connections=64, socket_keepalive=True
+        )
+    )
+    Session(app)
+else:
+    logger.warning("REDIS_URL not set - workflow state will be kept in the signed session cookie")
+if not os.getenv("SECRET_KEY"):
+    logger.warning("SECRET_KEY not set - using a per-process random key; sessions will not survive a restart")
+
+# Memoize idempotent backend lookups so re-submitting a step does not repeat LLM/DB work
+# The Jinja extension provides {% cache %} fragments; bump CACHE_KEY_PREFIX on deploy to invalidate them
+cache = Cache(app, with_jinja2_ext=True, config={
+    "CACHE_TYPE": "RedisCache" if REDIS_URL else "SimpleCache",
+    "CACHE_REDIS_URL": REDIS_URL,
+    "CACHE_DEFAULT_TIMEOUT": 300,
+    "CACHE_KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "insurance_app_")
+})
+
+def _state_cache_key(name, *args):
+    """Deterministic cache key for a backend call from its (JSON-serializable) arguments."""
+    payload = orjson.dumps(args, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return f"{name}:{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
+
+def _cached_call(name, func, *args, timeout=600):
+    """Return func(*args) from the cache, computing and storing it on a miss."""
+    key = _state_cache_key(name, *args)
+    result = cache.get(key)
+    if result is None:
+        result = func(*args)
+        cache.set(key, result, timeout=timeout)
+    return result
+
+def _session_correlation_id():
+    """Return the session's correlation ID, generating it only the first time."""
+    # Azure best practice: One correlation ID per workflow for end-to-end tracing
+    correlation_id = session.get('correlation_id')
+    if correlation_id is None:
+        correlation_id = session['correlation_id'] = token_hex(16)
+    return correlation_id
+
+@cache.memoize(timeout=300)
+def _cached_policy_details(policy_number):
+    """Policy lookup, memoized per policy number until the policy is changed."""
+    return _wp.get_policy_details(policy_number)
+
+# Compiled templates are cached on disk, so a fresh worker skips lex/parse/compile
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    "JINJA_BYTECODE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "insurance_app_jinja")
+)
+os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+
+# Compile the page templates at startup rather than on the first request
+for _template_name in ('index.html', 'new_policy.html', 'change_policy.html'):
+    try:
+        app.jinja_env.get_template(_template_name)
+    except TemplateNotFound:
+        logger.warning(f"Template not found at startup: {_template_name}")
+
+# Static assets are served with a one-year cache lifetime; url_for('static') appends
+# the file's modification time so a changed asset gets a new URL
+STATIC_MAX_AGE_SECONDS = 31536000
+if WhiteNoise is not None:
+    # WhiteNoise serves static files from memory-mapped metadata ahead of Flask routing
+    app.wsgi_app = WhiteNoise(app.wsgi_app, root=app.static_folder, prefix="static/",
+                              max_age=STATIC_MAX_AGE_SECONDS)
+else:
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE_SECONDS
+
+@functools.lru_cache(maxsize=256)
+def _static_version(filename):
+    """Version token for a static file, taken from its modification time."""
+    try:
+        return int(os.stat(os.path.join(app.static_folder, filename)).st_mtime)
+    except OSError:
+        return 0
+
+@app.url_defaults
+def _add_static_version(endpoint, values):
+    """Append the cache-busting version to static asset URLs."""
+    if endpoint == 'static' and 'filename' in values:
+        values.setdefault('v', _static_version(values['filename']))
+
+# Per-session polling endpoints that proxies must not cache or buffer
+_NO_STORE_ENDPOINTS = frozenset(('agent_status', 'policy_state'))
+
+@app.after_request
+def _disable_status_caching(response):
+    """Keep proxies from caching or buffering the per-session polling endpoints."""
+    if request.endpoint in _NO_STORE_ENDPOINTS:
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _cacheable_page(html, max_age=None, public=False):
+    """
+    Wrap rendered HTML with Cache-Control and an ETag, answering 304 when it matches.
+    
+    Without max_age the browser must revalidate on every visit (no-cache), so the
+    request still reaches the view while an unchanged page costs only a 304.
+    """
+    response = make_response(html)
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.max_age = max_age
+    response.add_etag()
+    return response.make_conditional(request)
+
+def _start_workflow(workflow_state, agent):
+    """Reset the session to step 1 of the given workflow."""
+    # Bound the session (and its Redis key) to PERMANENT_SESSION_LIFETIME
+    session.permanent = True
+    session['workflow_state'] = workflow_state
+    session['current_step'] = 1
+    session['agent'] = agent
+    # Tracing IDs are created here, so read-only endpoints never write the session
+    session['workflow_id'] = token_hex(16)
+    session['correlation_id'] = token_hex(16)
+
+def _finish_workflow(state_key):
+    """Drop a completed workflow's state, keeping the (permanent) session itself."""
+    # The next workflow gets a fresh correlation ID
+    session.pop(state_key, None)
+    session.pop('correlation_id', None)
+
+@cache.cached(timeout=60, key_prefix='view/index_html')
+def _index_html():
+    """Rendered landing page; it has no per-user content."""
+    return render_template('index.html')
+
 @app.route('/')
 def index():
     """Landing page with options for new policy or change policy"""
-    return render_template('index.html')
+    return _cacheable_page(_index_html(), max_age=60, public=True)
 
 @app.route('/new-policy', methods=['GET', 'POST'])
 def new_policy():
     """New policy creation flow"""
     if request.method == 'GET':
-        # Initialize new policy workflow
-        session['workflow_state'] = 'new_policy_started'
-        session['current_step'] = 1
-        session['agent'] = 'iris'
-        return render_template(
+        # Restart an in-progress workflow; a first visit leaves the session untouched
+        # so the page is the same for everyone. It is revalidated rather than served
+        # from the browser cache, because this request is what resets the workflow
+        if 'current_step' in session:
+            _start_workflow('new_policy_started', 'iris')
+        return _cacheable_page(render_template(
             'new_policy.html', 
             step=1, 
             agent='iris', 
             agent_message="Welcome! I'm Iris, your personal insurance assistant. Let's get started with your new policy."
-        )
+        ))
+    
+    # Initialize the new policy workflow on its first submission
+    if session.get('workflow_state') != 'new_policy_started':
+        _start_workflow('new_policy_started', 'iris')
     
     # Handle POST requests (form submissions)
     action = request.form.get('action')
@@ -49,7 +267,7 @@ def new_policy():
     if action == 'next':
         try:
             # Store correlation ID for error tracking
-            correlation_id = session.get('correlation_id', str(uuid.uuid4()))
+            correlation_id = _session_correlation_id()
             
             # Process the step with proper error context
             result = process_step(current_step, request.form)
@@ -103,16 +321,21 @@ def new_policy():
 def change_policy():
     """Policy change flow"""
     if request.method == 'GET':
-        # Initialize change policy workflow
-        session['workflow_state'] = 'change_policy_started'
-        session['current_step'] = 1
-        session['agent'] = 'zeus'
-        return render_template(
+        # Restart an in-progress workflow; a first visit leaves the session untouched
+        # so the page is the same for everyone. It is revalidated rather than served
+        # from the browser cache, because this request is what resets the workflow
+        if 'current_step' in session:
+            _start_workflow('change_policy_started', 'zeus')
+        return _cacheable_page(render_template(
             'change_policy.html', 
             step=1, 
             agent='zeus', 
             agent_message="Welcome back! I'm Zeus, your policy management expert. What would you like to change on your policy today?"
-        )
+        ))
+    
+    # Initialize the change policy workflow on its first submission
+    if session.get('workflow_state') != 'change_policy_started':
+        _start_workflow('change_policy_started', 'zeus')
     
     # Similar logic as new_policy but for the change workflow
     action = request.form.get('action')
@@ -159,6 +382,25 @@ def change_policy():
 
 
 
+# (epoch second, ISO-8601 UTC string), replaced as a whole so readers never see a torn pair
+_timestamp_cache = (0, '')
+
+def _iso_now():
+    """Current UTC time as an ISO-8601 string, formatted at most once per second."""
+    global _timestamp_cache
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache = (now, datetime.fromtimestamp(now, timezone.utc).isoformat())
+    return _timestamp_cache[1]
+
+@app.route('/api/policy-state', methods=['GET'])
+def policy_state():
+    """Return the accumulated workflow state, which step responses no longer repeat"""
+    return jsonify({
+        "policy": session.get('policy_state', {}),
+        "change": session.get('change_state', {})
+    })
+
 @app.route('/api/agent-status', methods=['GET'])
 def agent_status():
     """API endpoint to get real-time agent status with Azure monitoring integration
@@ -167,14 +409,15 @@ def agent_status():
     """
     agent = request.args.get('agent')
     step = request.args.get('step')
-    workflow_id = session.get('workflow_id', str(uuid.uuid4()))
+    # Polling only reads the session, so it is never re-saved or re-sent as a cookie
+    workflow_id = session.get('workflow_id')
     
     if not agent or not step:
         return jsonify({"error": "Missing parameters"}), 400
     
     try:
         # Azure best practice: Add correlation ID for cross-service tracing
-        correlation_id = request.args.get('correlation_id', str(uuid.uuid4()))
+        correlation_id = request.args.get('correlation_id') or session.get('correlation_id')
         
         # Call the backend function with proper tracing
         status = get_agent_status(
@@ -200,7 +443,7 @@ def agent_status():
                 "status": default_status.get("status", "active"),
                 "activity": default_status.get("activity", "Processing request"),
                 "progress": default_status.get("progress", 50),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _iso_now(),
                 "correlation_id": correlation_id,
                 "is_default": True
             })
@@ -208,7 +451,7 @@ def agent_status():
         # Add timestamp and correlation ID to the response
         if isinstance(status, dict):
             status.update({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _iso_now(),
                 "correlation_id": correlation_id
             })
         
@@ -223,54 +466,61 @@ def agent_status():
             "error": f"Error fetching agent status: {str(e)}",
             "agent": agent,
             "step": step,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _iso_now(),
             "correlation_id": request.args.get('correlation_id', 'unknown')
         }), 500
 
+# Lookup tables are built once at import and are read-only, instead of per call
+# Default activities by agent
+_DEFAULT_ACTIVITIES = MappingProxyType({
+    'iris': "Collecting customer information",
+    'mnemosyne': "Analyzing vehicle and driving history",
+    'hera': "Performing risk assessment",
+    'demeter': "Designing coverage options",
+    'apollo': "Creating policy documents",
+    'calliope': "Enhancing policy clarity",
+    'charon': "Processing payment options",
+    'hermes': "Finalizing policy issuance",
+    'zeus': "Overseeing policy creation"
+})
+
+# Default progress by step (1-9)
+_STEP_PROGRESS = MappingProxyType({
+    '1': 20, '2': 30, '3': 40, '4': 50,
+    '5': 65, '6': 75, '7': 85, '8': 95, '9': 100
+})
+
 def _get_default_agent_status(agent, step):
     """Get default agent status when real-time status isn't available"""
-    # Default activities by agent
-    default_activities = {
-        'iris': "Collecting customer information",
-        'mnemosyne': "Analyzing vehicle and driving history",
-        'hera': "Performing risk assessment",
-        'demeter': "Designing coverage options",
-        'apollo': "Creating policy documents",
-        'calliope': "Enhancing policy clarity",
-        'charon': "Processing payment options",
-        'hermes': "Finalizing policy issuance",
-        'zeus': "Overseeing policy creation"
-    }
-    
-    # Default progress by step (1-9)
-    step_progress = {
-        '1': 20, '2': 30, '3': 40, '4': 50, 
-        '5': 65, '6': 75, '7': 85, '8': 95, '9': 100
-    }
-    
     return {
         "status": "active",
-        "activity": default_activities.get(agent, "Processing your request"),
-        "progress": step_progress.get(str(step), 50),
+        "activity": _DEFAULT_ACTIVITIES.get(agent, "Processing your request"),
+        "progress": _STEP_PROGRESS.get(str(step), 50),
         "details": f"{agent.title()} is handling step {step} of your request",
         "is_default": True
     }
 
 # Helper functions to determine agents and messages for each step
+_AGENTS_BY_STEP = MappingProxyType({
+    1: ('iris', "I'll help collect your basic information."),
+    2: ('mnemosyne', "Let's gather detailed information about your vehicle and driving history."),
+    3: ('hera', "I'll analyze your data to recommend the best coverages for your needs."),
+    4: ('demeter', "I'll help you design your coverage package."),
+    5: ('apollo', "I'm preparing your policy draft based on your selections."),
+    6: ('calliope', "I'll polish your policy documents to ensure clarity and accuracy."),
+    7: ('charon', "I'm processing your payment options."),
+    8: ('hermes', "I'll handle the final issuance of your policy."),
+    9: ('zeus', "Congratulations on your new policy! Here's a summary of your coverage.")
+})
+_DEFAULT_AGENT = ('iris', "Let me assist you with the next step.")
+
 def get_agent_for_step(step):
     """Map workflow step to appropriate agent and initial message"""
-    agents = {
-        1: ('iris', "I'll help collect your basic information."),
-        2: ('mnemosyne', "Let's gather detailed information about your vehicle and driving history."),
-        3: ('hera', "I'll analyze your data to recommend the best coverages for your needs."),
-        4: ('demeter', "I'll help you design your coverage package."),
-        5: ('apollo', "I'm preparing your policy draft based on your selections."),
-        6: ('calliope', "I'll polish your policy documents to ensure clarity and accuracy."),
-        7: ('charon', "I'm processing your payment options."),
-        8: ('hermes', "I'll handle the final issuance of your policy."),
-        9: ('zeus', "Congratulations on your new policy! Here's a summary of your coverage.")
-    }
-    return agents.get(step, ('iris', "Let me assist you with the next step."))
+    return _AGENTS_BY_STEP.get(step, _DEFAULT_AGENT)
+
+# Azure best practice: Whitelist allowed extensions (with leading dot, as os.path.splitext returns them)
+_ALLOWED_EXTENSIONS = frozenset(('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.json', '.txt', '.csv'))
+
 def _validate_file(file):
     """
     Validate uploaded files for security and compatibility.
@@ -279,295 +529,432 @@ def _validate_file(file):
         file: The uploaded file object from request
         
     Returns:
-        bool: True if file is valid, False otherwise
+        str: Message for the user if the file is rejected, None if it is valid
     """
-    # Azure best practice: Whitelist allowed extensions
-    ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'json', 'txt', 'csv'}
-    
     # Check file extension
-    valid_extension = '.' in file.filename and \
-                     file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-    
-    # Azure best practice: Check file size (max 10MB)
-    MAX_SIZE_BYTES = 10 * 1024 * 1024  # 10MB
-    file.seek(0, os.SEEK_END)
-    file_size = file.tell()
-    file.seek(0)  # Reset file pointer
-    valid_size = file_size <= MAX_SIZE_BYTES
-    
-    if not valid_extension:
+    if os.path.splitext(file.filename)[1].lower() not in _ALLOWED_EXTENSIONS:
         logger.warning(f"Invalid file extension: {file.filename}")
-    if not valid_size:
-        logger.warning(f"File too large: {file_size} bytes (max {MAX_SIZE_BYTES})")
+        return "Invalid file format. Please upload a supported file type."
     
-    return valid_extension and valid_size
-
-def _cleanup_temp_file(file_path):
-    """
-    Safely remove temporary files.
+    # Azure best practice: Check file size (max 10MB) of the file itself; the request's
+    # Content-Length also counts the multipart boundaries and other form fields
+    file.stream.seek(0, os.SEEK_END)
+    file_size = file.stream.tell()
+    file.stream.seek(0)
+    if file_size > MAX_UPLOAD_BYTES:
+        logger.warning(f"File too large: {file_size} bytes (max {MAX_UPLOAD_BYTES})")
+        return f"File too large. Please upload a file of at most {MAX_UPLOAD_BYTES // (1024 * 1024)}MB."
     
-    Args:
-        file_path: Path to the file
-    """
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Cleaned up temporary file: {file_path}")
-    except Exception as e:
-        logger.warning(f"Failed to clean up temporary file {file_path}: {str(e)}")
+    return None
+
+_CHANGE_AGENTS_BY_STEP = MappingProxyType({
+    1: ('zeus', "What would you like to change on your policy?"),
+    2: ('demeter', "I'll help you adjust your coverage options."),
+    3: ('hera', "I'm recalculating your premium based on these changes."),
+    4: ('apollo', "I'm updating your policy documents."),
+    5: ('hermes', "I'm processing these changes for your policy."),
+    6: ('zeus', "Your policy has been successfully updated!")
+})
+_DEFAULT_CHANGE_AGENT = ('zeus', "Let me assist you with the next step.")
+
 def get_change_agent_for_step(step):
     """Map policy change workflow step to appropriate agent and initial message"""
-    agents = {
-        1: ('zeus', "What would you like to change on your policy?"),
-        2: ('demeter', "I'll help you adjust your coverage options."),
-        3: ('hera', "I'm recalculating your premium based on these changes."),
-        4: ('apollo', "I'm updating your policy documents."),
-        5: ('hermes', "I'm processing these changes for your policy."),
-        6: ('zeus', "Your policy has been successfully updated!")
-    }
-    return agents.get(step, ('zeus', "Let me assist you with the next step."))
+    return _CHANGE_AGENTS_BY_STEP.get(step, _DEFAULT_CHANGE_AGENT)
 
-def process_step(step, form_data):
-    """Process steps of new policy creation using existing backend functions
-    
-    Follows Azure best practices for workflow state management and error handling.
-    """
-    # Get current state from session or create new state dict
-    current_state = session.get('policy_state', {})
+def _step1(step, current_state, form_data, state_updates):
+    """Step 1: Basic Information (Iris)"""
+    # Azure best practice: Add correlation ID for end-to-end tracing
+    correlation_id = _session_correlation_id()
+    logger.info(f"Starting step 1 processing with correlation ID: {correlation_id}")
     
-    try:
-        # Step 1: Basic Information (Iris)
-        if step == 1:
-            # Azure best practice: Add correlation ID for end-to-end tracing
-            correlation_id = str(uuid.uuid4())
-            logger.info(f"Starting step 1 processing with correlation ID: {correlation_id}")
-            
-            # Handle file upload if present
-            customer_file = None
-            if 'customerFile' in request.files and request.files['customerFile'].filename:
-                file = request.files['customerFile']
-                
-                # Azure best practice: Validate file before processing
-                if _validate_file(file):
-                    # Azure best practice: Use unique filenames with secure handling
-                    unique_filename = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
-                    temp_path = os.path.join(tempfile.gettempdir(), unique_filename)
-                    file.save(temp_path)
-                    customer_file = temp_path
-                    
-                    logger.info(f"File saved to temporary location, correlation ID: {correlation_id}")
-                    
-                    # Azure best practice: Direct integration with existing workflow
-                    try:
-                        # Use the existing process_insurance_request with the file path
-                        # This delegates file parsing and extraction to the existing process
-                        policy_data = process_insurance_request(customer_file=customer_file)
-                        
-                        # Store the processed data in session for future steps
-                        current_state.update(policy_data)
-                        session['policy_state'] = current_state
-                        session['correlation_id'] = correlation_id
-                        
-                        return {
-                            "processed": True,
-                            "step": step,
-                            "state": current_state,
-                            "correlation_id": correlation_id,
-                            "from_file": True
-                        }
-                    except Exception as proc_error:
-                        # Azure best practice: Structured error logging with context
-                        logger.error(f"Error in file processing: {str(proc_error)}", 
-                                     extra={"correlation_id": correlation_id}, exc_info=True)
-                        # Cleanup temp file on error
-                        _cleanup_temp_file(temp_path)
-                        # Fall through to form-based processing
-                else:
-                    logger.warning(f"Invalid file uploaded: {file.filename}", 
-                                  extra={"correlation_id": correlation_id})
-                    raise ValueError("Invalid file format. Please upload a supported file type.")
-            
-            # If no file uploaded or file processing failed, use form data
-            current_state['customerProfile'] = {
-                "name": form_data.get('fullName'),
-                "dob": form_data.get('dateOfBirth'),
-                "email": form_data.get('email'),
-                "phone": form_data.get('phoneNumber'),
-                "address": form_data.get('address'),
-            }
-            
-            # Store the session data
-            session['policy_state'] = current_state
-            session['correlation_id'] = correlation_id
-            
-            return {
-                "processed": True,
-                "step": step,
-                "state": current_state,
-                "correlation_id": correlation_id,
-                "from_file": False
-            }
+    # Handle file upload if present
+    if 'customerFile' in request.files and request.files['customerFile'].filename:
+        file = request.files['customerFile']
         
-        # Remaining steps (2-9) stay the same
-        # ...        
-        # Step 2: Vehicle & Driving Details (Mnemosyne)
-        elif step == 2:
-            # Add vehicle information to state
-            current_state['vehicleDetails'] = {
-                "make": form_data.get('vehicleMake'),
-                "model": form_data.get('vehicleModel'),
-                "year": form_data.get('vehicleYear'),
-                "vin": form_data.get('vin'),
-            }
-            
-            current_state['drivingRecord'] = {
-                "violations": form_data.get('violations'),
-                "accidents": form_data.get('accidents'),
-                "yearsLicensed": form_data.get('yearsLicensed')
-            }
-            
-            # Update session state
-            session['policy_state'] = current_state
-            return {
-                "processed": True,
-                "step": step,
-                "state": current_state
-            }
-        
-        # Step 3: Risk Assessment (Hera)
-        elif step == 3:
-            # Azure best practice: Use an Azure Function for compute-intensive operations
-            # This would be an async call with a status check in real implementation
-            from workflow.process import assess_risk
-            risk_assessment = assess_risk(current_state)
-            current_state['riskAssessment'] = risk_assessment
-            
-            # Update session state
-            session['policy_state'] = current_state
-            return {
-                "processed": True,
-                "step": step,
-                "riskLevel": risk_assessment.get('riskLevel', 'Medium'),
-                "riskFactors": risk_assessment.get('factors', []),
-                "state": current_state
-            }
-        
-        # Step 4: Coverage Design (Demeter)
-        elif step == 4:
-            # Extract coverage selections from form
-            coverage = {
-                "coverages": [],
-                "limits": {},
-                "deductibles": {}
-            }
-            
-            # Mandatory coverages - always included
-            mandatory = ["Bodily Injury", "Property Damage", "Uninsured Motorist Bodily Injury"]
-            for cov in mandatory:
-                coverage["coverages"].append(cov)
-            
-            # Get limits from form data
-            coverage["limits"]["Bodily Injury"] = {
-                "per_person": int(form_data.get('bodilyInjuryLimit').split('/')[0]),
-                "per_accident": int(form_data.get('bodilyInjuryLimit').split('/')[1])
-            }
-            
-            coverage["limits"]["Property Damage"] = {
-                "amount": int(form_data.get('propertyDamageLimit'))
-            }
+        # Azure best practice: Validate file before processing
+        file_error = _validate_file(file)
+        if file_error is None:
+            # The upload is at most MAX_UPLOAD_BYTES, so it is handed over in memory
+            # rather than copied to a temporary file and read back
+            file_bytes = file.read()
             
-            coverage["limits"]["Uninsured Motorist"] = {
-                "per_person": int(form_data.get('uninsuredMotoristLimit').split('/')[0]),
-                "per_accident": int(form_data.get('uninsuredMotoristLimit').split('/')[1])
-            }
+            logger.info(f"Read uploaded file ({len(file_bytes)} bytes), correlation ID: {correlation_id}")
             
-            # Optional coverages
-            if form_data.get('collision'):
-                coverage["coverages"].append("Collision")
-                coverage["deductibles"]["Collision"] = int(form_data.get('collisionDeductible', 500))
-            
-            if form_data.get('comprehensive'):
-                coverage["coverages"].append("Comprehensive")
-                coverage["deductibles"]["Comprehensive"] = int(form_data.get('comprehensiveDeductible', 500))
-            
-            if form_data.get('rentalReimbursement'):
-                coverage["coverages"].append("Rental Reimbursement")
-            
-            if form_data.get('roadside'):
-                coverage["coverages"].append("Roadside Assistance")
-            
-            # Store coverage in state
-            current_state['coverage'] = coverage
-            
-            # Call backend to design coverage with demeter
-            from workflow.process import design_coverage_with_demeter
-            # In the real implementation, you'd use the agents from process.py
-            # For now, we'll just use the coverage object
-            current_state['coverage'] = coverage
-            
-            # Update session state
-            session['policy_state'] = current_state
-            return {
-                "processed": True,
-                "step": step,
-                "coverage": coverage,
-                "state": current_state
-            }
-        
-        # Step 5-8: These would follow similar patterns, calling appropriate backend functions
-        # For brevity, I'll skip the implementation details but would follow same pattern
-        
-        # Step 9: Final Policy (Zeus) - Complete the process
-        elif step == 9:
-            # Final step - Call process_insurance_request with complete state
+            # Azure best practice: Direct integration with existing workflow
             try:
-                # Azure best practice: Add traceability for long-running operations
-                correlation_id = str(uuid.uuid4())
-                logger.info(f"Starting policy creation with correlation ID: {correlation_id}")
-                
-                # Call the main process function with our accumulated state
-                complete_policy = process_insurance_request(
-                    customer_data=current_state,
-                    correlation_id=correlation_id
+                # This delegates file parsing and extraction to the existing process
+                policy_data = process_insurance_request(
+                    customer_file_bytes=file_bytes,
+                    customer_filename=secure_filename(file.filename)
                 )
                 
-                # Reset session state now that we've completed
-                session.pop('policy_state', None)
-                
-                # Store completed policy ID for reference
-                session['completed_policy_id'] = complete_policy.get('policyNumber', 'Unknown')
+                # Store the processed data in session for future steps
+                current_state.update(policy_data)
+                state_updates['policy_state'] = current_state
                 
                 return {
                     "processed": True,
                     "step": step,
-                    "complete": True,
-                    "policy": complete_policy
+                    "stepResult": policy_data,
+                    "correlation_id": correlation_id,
+                    "from_file": True
                 }
-                
-            except Exception as e:
-                # Azure best practice: Log detailed errors to Application Insights
-                logger.error(f"Policy creation failed: {str(e)}", exc_info=True)
-                # Reuse Azure's error codes/messages where applicable
-                raise ValueError(f"Policy creation failed: {str(e)}")
-        
-        # Default case - for steps we haven't fully implemented
+            except Exception as proc_error:
+                # Azure best practice: Structured error logging with context
+                logger.error(f"Error in file processing: {str(proc_error)}", 
+                             extra={"correlation_id": correlation_id}, exc_info=True)
+                # Fall through to form-based processing
         else:
-            # Update session with current state
-            session['policy_state'] = current_state
-            return {
-                "processed": True,
-                "step": step,
-                "state": current_state
-            }
+            logger.warning(f"Invalid file uploaded: {file.filename}", 
+                          extra={"correlation_id": correlation_id})
+            raise ValueError(file_error)
+    
+    # If no file uploaded or file processing failed, use form data
+    current_state['customerProfile'] = {
+        "name": form_data.get('fullName'),
+        "dob": form_data.get('dateOfBirth'),
+        "email": form_data.get('email'),
+        "phone": form_data.get('phoneNumber'),
+        "address": form_data.get('address'),
+    }
+    
+    # Store the session data
+    state_updates['policy_state'] = current_state
+    
+    return {
+        "processed": True,
+        "step": step,
+        "stepResult": {"customerProfile": current_state['customerProfile']},
+        "correlation_id": correlation_id,
+        "from_file": False
+    }
+
+def _step2(step, current_state, form_data, state_updates):
+    """Step 2: Vehicle & Driving Details (Mnemosyne)"""
+    # Add vehicle information to state
+    current_state['vehicleDetails'] = {
+        "make": form_data.get('vehicleMake'),
+        "model": form_data.get('vehicleModel'),
+        "year": form_data.get('vehicleYear'),
+        "vin": form_data.get('vin'),
+    }
+    
+    current_state['drivingRecord'] = {
+        "violations": form_data.get('violations'),
+        "accidents": form_data.get('accidents'),
+        "yearsLicensed": form_data.get('yearsLicensed')
+    }
+    
+    # Update session state
+    state_updates['policy_state'] = current_state
+    return {
+        "processed": True,
+        "step": step,
+        "stepResult": {
+            "vehicleDetails": current_state['vehicleDetails'],
+            "drivingRecord": current_state['drivingRecord']
+        }
+    }
+
+def _step3(step, current_state, form_data, state_updates):
+    """Step 3: Risk Assessment (Hera)"""
+    # Azure best practice: Use an Azure Function for compute-intensive operations
+    # This would be an async call with a status check in real implementation
+    risk_assessment = _cached_call("assess_risk", _wp.assess_risk, current_state)
+    current_state['riskAssessment'] = risk_assessment
+    
+    # Update session state
+    state_updates['policy_state'] = current_state
+    return {
+        "processed": True,
+        "step": step,
+        "riskLevel": risk_assessment.get('riskLevel', 'Medium'),
+        "riskFactors": risk_assessment.get('factors', [])
+    }
+
+# Split limits such as "100000/300000" into per-person and per-accident amounts
+_LIMIT_RE = re.compile(r'^(\d+)/(\d+)$')
+
+def _split_limit(value):
+    """Parse a "per_person/per_accident" limit string into two ints."""
+    match = _LIMIT_RE.match(value or '')
+    if not match:
+        raise ValueError(f"Bad limit {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+def _step4(step, current_state, form_data, state_updates):
+    """Step 4: Coverage Design (Demeter)"""
+    # Extract coverage selections from form
+    coverage = {
+        "coverages": [],
+        "limits": {},
+        "deductibles": {}
+    }
+    
+    # Mandatory coverages - always included
+    mandatory = ["Bodily Injury", "Property Damage", "Uninsured Motorist Bodily Injury"]
+    for cov in mandatory:
+        coverage["coverages"].append(cov)
+    
+    # Get limits from form data
+    per_person, per_accident = _split_limit(form_data.get('bodilyInjuryLimit'))
+    coverage["limits"]["Bodily Injury"] = {
+        "per_person": per_person,
+        "per_accident": per_accident
+    }
+    
+    coverage["limits"]["Property Damage"] = {
+        "amount": int(form_data.get('propertyDamageLimit'))
+    }
+    
+    per_person, per_accident = _split_limit(form_data.get('uninsuredMotoristLimit'))
+    coverage["limits"]["Uninsured Motorist"] = {
+        "per_person": per_person,
+        "per_accident": per_accident
+    }
+    
+    # Optional coverages
+    if form_data.get('collision'):
+        coverage["coverages"].append("Collision")
+        coverage["deductibles"]["Collision"] = int(form_data.get('collisionDeductible', 500))
+    
+    if form_data.get('comprehensive'):
+        coverage["coverages"].append("Comprehensive")
+        coverage["deductibles"]["Comprehensive"] = int(form_data.get('comprehensiveDeductible', 500))
+    
+    if form_data.get('rentalReimbursement'):
+        coverage["coverages"].append("Rental Reimbursement")
+    
+    if form_data.get('roadside'):
+        coverage["coverages"].append("Roadside Assistance")
+    
+    # Store coverage in state
+    current_state['coverage'] = coverage
+    
+    # Call backend to design coverage with demeter
+    # In the real implementation, you'd use the agents from process.py
+    # For now, we'll just use the coverage object
+    current_state['coverage'] = coverage
+    
+    # Update session state
+    state_updates['policy_state'] = current_state
+    return {
+        "processed": True,
+        "step": step,
+        "coverage": coverage
+    }
+
+def _step9(step, current_state, form_data, state_updates):
+    """Step 9: Final Policy (Zeus) - Complete the process"""
+    # Final step - Call process_insurance_request with complete state
+    try:
+        # Azure best practice: Add traceability for long-running operations
+        correlation_id = _session_correlation_id()
+        logger.info(f"Starting policy creation with correlation ID: {correlation_id}")
+        
+        # Call the main process function with our accumulated state
+        complete_policy = process_insurance_request(
+            customer_data=current_state,
+            correlation_id=correlation_id
+        )
+        
+        # Drop the workflow state now that we've completed
+        _finish_workflow('policy_state')
+        
+        # Store completed policy ID for reference
+        state_updates['completed_policy_id'] = complete_policy.get('policyNumber', 'Unknown')
+        
+        return {
+            "processed": True,
+            "step": step,
+            "complete": True,
+            "policy": complete_policy
+        }
+        
+    except Exception as e:
+        # Azure best practice: Log detailed errors to Application Insights
+        logger.error(f"Policy creation failed: {str(e)}", exc_info=True)
+        # Reuse Azure's error codes/messages where applicable
+        raise ValueError(f"Policy creation failed: {str(e)}")
+
+def _step_default(step, current_state, form_data, state_updates):
+    """Default case - for steps we haven't fully implemented"""
+    # Nothing changed, so the session is not rewritten
+    return {
+        "processed": True,
+        "step": step
+    }
+
+# Step number to handler; steps 5-8 are not implemented yet and use _step_default
+_STEP_HANDLERS = MappingProxyType({
+    1: _step1,
+    2: _step2,
+    3: _step3,
+    4: _step4,
+    9: _step9
+})
+
+def process_step(step, form_data):
+    """Process steps of new policy creation using existing backend functions
+    
+    Follows Azure best practices for workflow state management and error handling.
+    """
+    # Get current state from session or create new state dict
+    current_state = session.get('policy_state', {})
+    # Session writes are collected here and applied once when the step finishes
+    state_updates = {}
+    
+    try:
+        handler = _STEP_HANDLERS.get(step, _step_default)
+        return handler(step, current_state, form_data, state_updates)
     
     except Exception as e:
         # Azure best practice: Application Insights for error logging
-        logger.error(f"Error in process_step at step {step}: {str(e)}", exc_info=True)
+        logger.error(f"Error in process_step at step {step}: {str(e)}",
+                     exc_info=_sample_traceback(e, step))
         # Add telemetry correlation
         if hasattr(e, 'trace_id'):
             logger.info(f"Error trace ID: {e.trace_id}")
             
         raise ValueError(f"Error processing step {step}: {str(e)}")
+    
+    finally:
+        if state_updates:
+            session.update(state_updates)
+
+def _change_step1(step, change_state, form_data, state_updates):
+    """Step 1: Get policy details and change request"""
+    # Get policy number
+    policy_number = form_data.get('policyNumber')
+    change_description = form_data.get('changeDescription')
+    
+    if not policy_number:
+        raise ValueError("Policy number is required")
+    
+    # Store policy number and change request in session
+    change_state['policyNumber'] = policy_number
+    change_state['changeRequest'] = change_description
+    state_updates['change_state'] = change_state
+    
+    # Try to fetch policy details as validation
+    policy = _cached_policy_details(policy_number)
+    
+    if not policy:
+        raise ValueError(f"Policy {policy_number} not found")
+    
+    change_state['currentPolicy'] = policy
+    
+    return {
+        "processed": True,
+        "step": step,
+        "policy": policy
+    }
+
+def _change_step2(step, change_state, form_data, state_updates):
+    """Step 2: Coverage modifications (Demeter)"""
+    # Extract coverage changes
+    coverage_changes = {
+        "action": form_data.get('coverageAction', 'modify'),  # add, remove, modify
+        "type": form_data.get('coverageType'),                # limits, deductibles, optional
+    }
+    
+    if coverage_changes["type"] == "limits":
+        coverage_name = form_data.get('coverageName')
+        new_limit = form_data.get('newLimit')
+        coverage_changes["coverage"] = coverage_name
+        coverage_changes["newValue"] = new_limit
+    
+    elif coverage_changes["type"] == "deductibles":
+        coverage_name = form_data.get('coverageName')
+        new_deductible = form_data.get('newDeductible')
+        coverage_changes["coverage"] = coverage_name
+        coverage_changes["newValue"] = new_deductible
+    
+    elif coverage_changes["type"] == "optional":
+        coverage_name = form_data.get('coverageName')
+        action = form_data.get('optionAction')  # add or remove
+        coverage_changes["coverage"] = coverage_name
+        coverage_changes["optionAction"] = action
+    
+    # Store the changes in session
+    change_state['coverageChanges'] = coverage_changes
+    state_updates['change_state'] = change_state
+    
+    return {
+        "processed": True,
+        "step": step,
+        "changes": coverage_changes
+    }
+
+def _change_step3(step, change_state, form_data, state_updates):
+    """Step 3: Premium recalculation (Hera)"""
+    # Azure best practice: Use Azure Functions for compute-intensive operations
+    policy = change_state.get('currentPolicy', {})
+    changes = change_state.get('coverageChanges', {})
+    
+    # Call backend for premium calculation
+    new_premium = _cached_call("recalculate_premium", _wp.recalculate_premium, policy, changes)
+    
+    change_state['newPremium'] = new_premium
+    state_updates['change_state'] = change_state
+    
+    return {
+        "processed": True,
+        "step": step,
+        "premium": new_premium
+    }
+
+def _change_step6(step, change_state, form_data, state_updates):
+    """Step 6: Final policy change (Zeus)"""
+    # Process the complete change with the backend
+    try:
+        # Azure best practice: Add correlation ID for tracing
+        correlation_id = _session_correlation_id()
+        logger.info(f"Processing policy change with correlation ID: {correlation_id}")
+        
+        # Call the backend function to handle the policy change
+        updated_policy = handle_policy_change(
+            policy_id=change_state.get('policyNumber'),
+            change_request=change_state.get('changeRequest'),
+            coverage_changes=change_state.get('coverageChanges'),
+            correlation_id=correlation_id
+        )
+        
+        # The policy has changed, so drop its memoized details
+        cache.delete_memoized(_cached_policy_details, change_state.get('policyNumber'))
+        
+        # Drop the change state now that we're done
+        _finish_workflow('change_state')
+        
+        # Store updated policy info
+        state_updates['updated_policy_id'] = updated_policy.get('policyNumber', 'Unknown')
+        
+        return {
+            "processed": True,
+            "step": step,
+            "complete": True,
+            "policy": updated_policy
+        }
+        
+    except Exception as e:
+        logger.error(f"Policy change failed: {str(e)}", exc_info=True)
+        raise ValueError(f"Policy change failed: {str(e)}")
+
+def _change_step_default(step, change_state, form_data, state_updates):
+    """Default for other steps"""
+    # Nothing changed, so the session is not rewritten
+    return {
+        "processed": True,
+        "step": step
+    }
+
+# Step number to handler; steps 4-5 (Apollo, Hermes) are not implemented yet and use _change_step_default
+_CHANGE_STEP_HANDLERS = MappingProxyType({
+    1: _change_step1,
+    2: _change_step2,
+    3: _change_step3,
+    6: _change_step6
+})
 
 def process_change_step(step, form_data):
     """Process policy change workflow using the backend handle_policy_change function
@@ -576,146 +963,25 @@ def process_change_step(step, form_data):
     """
     # Get current state from session or initialize
     change_state = session.get('change_state', {})
+    # Session writes are collected here and applied once when the step finishes
+    state_updates = {}
     
     try:
-        # Step 1: Get policy details and change request
-        if step == 1:
-            # Get policy number
-            policy_number = form_data.get('policyNumber')
-            change_description = form_data.get('changeDescription')
-            
-            if not policy_number:
-                raise ValueError("Policy number is required")
-            
-            # Store policy number and change request in session
-            change_state['policyNumber'] = policy_number
-            change_state['changeRequest'] = change_description
-            session['change_state'] = change_state
-            
-            # Try to fetch policy details as validation
-            from workflow.process import get_policy_details
-            policy = get_policy_details(policy_number)
-            
-            if not policy:
-                raise ValueError(f"Policy {policy_number} not found")
-            
-            change_state['currentPolicy'] = policy
-            session['change_state'] = change_state
-            
-            return {
-                "processed": True,
-                "step": step,
-                "policy": policy
-            }
-        
-        # Step 2: Coverage modifications (Demeter)
-        elif step == 2:
-            # Extract coverage changes
-            coverage_changes = {
-                "action": form_data.get('coverageAction', 'modify'),  # add, remove, modify
-                "type": form_data.get('coverageType'),                # limits, deductibles, optional
-            }
-            
-            if coverage_changes["type"] == "limits":
-                coverage_name = form_data.get('coverageName')
-                new_limit = form_data.get('newLimit')
-                coverage_changes["coverage"] = coverage_name
-                coverage_changes["newValue"] = new_limit
-            
-            elif coverage_changes["type"] == "deductibles":
-                coverage_name = form_data.get('coverageName')
-                new_deductible = form_data.get('newDeductible')
-                coverage_changes["coverage"] = coverage_name
-                coverage_changes["newValue"] = new_deductible
-            
-            elif coverage_changes["type"] == "optional":
-                coverage_name = form_data.get('coverageName')
-                action = form_data.get('optionAction')  # add or remove
-                coverage_changes["coverage"] = coverage_name
-                coverage_changes["optionAction"] = action
-            
-            # Store the changes in session
-            change_state['coverageChanges'] = coverage_changes
-            session['change_state'] = change_state
-            
-            return {
-                "processed": True,
-                "step": step,
-                "changes": coverage_changes
-            }
-        
-        # Step 3: Premium recalculation (Hera)
-        elif step == 3:
-            # Azure best practice: Use Azure Functions for compute-intensive operations
-            policy = change_state.get('currentPolicy', {})
-            changes = change_state.get('coverageChanges', {})
-            
-            # Call backend for premium calculation
-            from workflow.process import recalculate_premium
-            new_premium = recalculate_premium(policy, changes)
-            
-            change_state['newPremium'] = new_premium
-            session['change_state'] = change_state
-            
-            return {
-                "processed": True,
-                "step": step,
-                "premium": new_premium
-            }
-        
-        # Step 4-5: Document updates and processing (Apollo, Hermes)
-        # ...Implementation similar to above...
-        
-        # Step 6: Final policy change (Zeus)
-        elif step == 6:
-            # Process the complete change with the backend
-            try:
-                # Azure best practice: Add correlation ID for tracing
-                correlation_id = str(uuid.uuid4())
-                logger.info(f"Processing policy change with correlation ID: {correlation_id}")
-                
-                # Call the backend function to handle the policy change
-                updated_policy = handle_policy_change(
-                    policy_id=change_state.get('policyNumber'),
-                    change_request=change_state.get('changeRequest'),
-                    coverage_changes=change_state.get('coverageChanges'),
-                    correlation_id=correlation_id
-                )
-                
-                # Reset change state now that we're done
-                session.pop('change_state', None)
-                
-                # Store updated policy info
-                session['updated_policy_id'] = updated_policy.get('policyNumber', 'Unknown')
-                
-                return {
-                    "processed": True,
-                    "step": step,
-                    "complete": True,
-                    "policy": updated_policy
-                }
-                
-            except Exception as e:
-                logger.error(f"Policy change failed: {str(e)}", exc_info=True)
-                raise ValueError(f"Policy change failed: {str(e)}")
-        
-        # Default for other steps
-        else:
-            # Store state and pass it along
-            session['change_state'] = change_state
-            return {
-                "processed": True,
-                "step": step,
-                "state": change_state
-            }
+        handler = _CHANGE_STEP_HANDLERS.get(step, _change_step_default)
+        return handler(step, change_state, form_data, state_updates)
     
     except Exception as e:
         # Azure best practice: Add structured error logging
-        logger.error(f"Error in process_change_step at step {step}: {str(e)}", exc_info=True)
+        logger.error(f"Error in process_change_step at step {step}: {str(e)}",
+                     exc_info=_sample_traceback(e, f"change{step}"))
         if hasattr(e, 'status_code'):
             logger.info(f"Error status code: {e.status_code}")
         
         raise ValueError(f"Error processing change step {step}: {str(e)}")
+    
+    finally:
+        if state_updates:
+            session.update(state_updates)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
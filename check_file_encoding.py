@@ -1,16 +1,28 @@
-import re
+import os
+import mmap
 
 path = r"c:\Users\pramadasan\insurance_app\workflow\process.py"
-data = open(path, "rb").read()
 
-nul_count = data.count(b"\x00")
-crlf_count = len(re.findall(rb"\r\n", data))
-# “LF” not preceded by CR:
-lf_count   = len(re.findall(rb"(?<!\r)\n", data))
-# “CR” not followed by LF:
-cr_count   = len(re.findall(rb"\r(?!\n)", data))
+with open(path, "rb") as f:
+    # mmap.count (Python 3.13+) scans a read-only mapping without copying the file;
+    # older Pythons, and empty files (which cannot be mapped), read the bytes instead
+    if hasattr(mmap.mmap, "count") and os.fstat(f.fileno()).st_size:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        data = f.read()
+
+    # Plain substring counts: no regex backtracking or per-match objects
+    nul_count = data.count(b"\x00")
+    crlf_count = data.count(b"\r\n")
+    # “LF” not preceded by CR: every LF that is not part of a CRLF
+    lf_count   = data.count(b"\n") - crlf_count
+    # “CR” not followed by LF: every CR that is not part of a CRLF
+    cr_count   = data.count(b"\r") - crlf_count
+
+    if isinstance(data, mmap.mmap):
+        data.close()
 
 print(f"Null bytes (00): {nul_count}")
 print(f"CRLF sequences (0D0A): {crlf_count}")
 print(f"Orphan LF      (0A not preceded by 0D): {lf_count}")
-print(f"Orphan CR      (0D not followed  by 0A): {cr_count}")
\ No newline at end of file
+print(f"Orphan CR      (0D not followed  by 0A): {cr_count}")
@@ -0,0 +1,99 @@
+"""
+Azure OpenAI clients and Azure AD credentials shared by every module.
+
+All clients send their requests over one pooled HTTP/2 connection, so
+embedding and chat calls share warm TCP/TLS connections and can run in
+parallel over one connection. Scripts that ask for a client with the same
+credentials get the same instance back instead of building a new one.
+"""
+import os
+import functools
+import httpx
+
+class _SharedHttpClient(httpx.Client):
+    """
+    httpx client shared by every Azure OpenAI client.
+
+    AutoGen deep-copies llm_config when building an agent; returning self keeps
+    one connection pool (and its warm TCP/TLS connections) for all agents.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+# Upper bounds in seconds per request, so a hung call fails with a timeout error
+# instead of holding the caller indefinitely. Long GPT-4o completions (policy
+# drafting) can take minutes to return, so OpenAI reads get a much larger bound
+# than Cosmos DB point reads and queries.
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "300"))
+COSMOS_TIMEOUT_SECONDS = float(os.getenv("COSMOS_TIMEOUT_SECONDS", "60"))
+
+# Pooled keep-alive HTTP/2 connections so LLM calls skip the TCP+TLS handshake
+shared_http_client = _SharedHttpClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=2000, max_keepalive_connections=500),
+    timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=10.0)
+)
+
+# Keyword arguments for every CosmosClient: connection_timeout bounds the
+# connect, timeout bounds the whole request including retries
+COSMOS_CLIENT_OPTIONS = {
+    "connection_timeout": COSMOS_TIMEOUT_SECONDS,
+    "timeout": COSMOS_TIMEOUT_SECONDS
+}
+
+@functools.lru_cache(maxsize=None)
+def get_azure_client(api_key, azure_endpoint, api_version):
+    """
+    Return the AzureOpenAI client for these credentials, creating it once per process.
+
+    Args:
+        api_key (str): Azure OpenAI API key
+        azure_endpoint (str): Azure OpenAI endpoint URL
+        api_version (str): Azure OpenAI API version
+
+    Returns:
+        AzureOpenAI: Client using the shared connection pool
+    """
+    # Imported here so modules that only need the credential or Cosmos options skip openai
+    from openai import AzureOpenAI
+
+    return AzureOpenAI(
+        api_key=api_key,
+        api_version=api_version,
+        azure_endpoint=azure_endpoint,
+        http_client=shared_http_client
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_azure_credential(tenant_id=None, client_id=None, client_secret=None):
+    """
+    Return the Azure AD credential for Cosmos DB, creating it once per process.
+
+    The Azure CLI login is tried first, then the service principal when its
+    settings are present. Nothing is probed up front; the Cosmos DB client asks
+    for a token on its first request and reuses it until it nears expiry. Set
+    AZURE_TOKEN_CACHE to a cache name to persist service principal tokens
+    between runs.
+
+    Args:
+        tenant_id (str, optional): Service principal tenant ID
+        client_id (str, optional): Service principal client ID
+        client_secret (str, optional): Service principal secret
+
+    Returns:
+        ChainedTokenCredential: Credential to pass to CosmosClient
+    """
+    # Imported here so modules that only need the OpenAI clients skip azure.identity
+    from azure.identity import (
+        AzureCliCredential, ChainedTokenCredential, ClientSecretCredential, TokenCachePersistenceOptions
+    )
+
+    sources = [AzureCliCredential()]
+    if tenant_id and client_id and client_secret:
+        options = {}
+        cache_name = os.getenv("AZURE_TOKEN_CACHE")
+        if cache_name:
+            options["cache_persistence_options"] = TokenCachePersistenceOptions(name=cache_name)
+        sources.append(ClientSecretCredential(tenant_id, client_id, client_secret, **options))
+    return ChainedTokenCredential(*sources)
@@ -1,16 +1,16 @@
 from azure.identity import DefaultAzureCredential, AzureCliCredential
-from dotenv import load_dotenv
+from env import load_env
 import os
-from openai import AzureOpenAI
+from clients import get_azure_client
 
 # Load environment variables
-load_dotenv('x.env')
+load_env('x.env')
 
-# Initialize Azure OpenAI client
-azure_client = AzureOpenAI(
-    azure_endpoint=os.getenv('ENDPOINT_URL'),
-    api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-    api_version="2024-12-01-preview"
+# Initialize Azure OpenAI client (shared instance and connection pool)
+azure_client = get_azure_client(
+    os.getenv('AZURE_OPENAI_API_KEY'),
+    os.getenv('ENDPOINT_URL'),
+    "2024-12-01-preview"
 )
 
 # Set up deployment configurations
@@ -55,7 +55,7 @@ def config_list_from_model(model_name):
     """
     # Ensure environment variables are loaded
     if os.path.exists("x1.env"):
-        load_dotenv("x1.env")
+        load_env("x1.env")
         
     # Azure OpenAI configuration requires specific formatting
     return [{
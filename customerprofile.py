@@ -1,22 +1,27 @@
 import os
+import re
 import argparse
-import json
+import math
+import orjson
+from collections import Counter
 import numpy as np
 import datetime
-from scipy.spatial.distance import cosine
-from dotenv import load_dotenv
-from azure.cosmos import CosmosClient
-from azure.identity import AzureCliCredential, ClientSecretCredential
-from openai import AzureOpenAI
+import time
+import sqlite3
+import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from env import load_env
 import sys
-from autogen import AssistantAgent
-from config import config_list_gpt4o
 import h3  # H3 geospatial indexing library
-from geopy.geocoders import Nominatim  # For geocoding addresses
+import embedding_cache
+
+try:
+    import faiss  # Optional: approximate nearest-neighbor search for large corpora
+except ImportError:
+    faiss = None
 import logging
-from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential
-import os
 # Suppress httpx INFO logs
 # Configure logging once at the top of the file
 # Configure logging once at the top of the file
@@ -25,13 +30,17 @@ logger = logging.getLogger(__name__)
 
 
 
+
 # ----------------------------
 # Command Line Argument Handling
 # ----------------------------
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Customer profile matching system")
-    parser.add_argument("--input", "-i", type=str, required=True, 
-                        help="Path to input customer data file (JSON)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", "-i", type=str, 
+                        help="Path to input customer data file (JSON object, or an array to match several customers)")
+    source.add_argument("--stdin", action="store_true", 
+                        help="Read customer data (JSON object or array) from standard input instead of a file")
     parser.add_argument("--top", "-t", type=int, default=3, 
                         help="Number of top matches to return")
     parser.add_argument("--quiet", "-q", action="store_true", 
@@ -161,7 +170,7 @@ def validate_azure_openai_configuration(config, connections):
 # ----------------------------
 def initialize_configs(verbose=True):
     # Load environment variables
-    load_dotenv("x1.env")
+    load_env("x1.env")
     
     config = {}
     
@@ -188,13 +197,18 @@ def initialize_configs(verbose=True):
 
 
 def connect_to_services(config, verbose=True):
+    # Azure SDKs are imported here so importing this module (e.g. from Hera)
+    # does not pay for them until services are actually needed
+    from clients import get_azure_client, get_azure_credential, COSMOS_CLIENT_OPTIONS
+    from azure.cosmos import CosmosClient
+
     connections = {}
     
     try:
-        connections["openai"] = AzureOpenAI(
-            api_key=config["openai_api_key"],
-            api_version=config["api_version"],
-            azure_endpoint=config["openai_endpoint"]
+        connections["openai"] = get_azure_client(
+            config["openai_api_key"],
+            config["openai_endpoint"],
+            config["api_version"]
         )
 
         # Test Azure OpenAI connection
@@ -205,19 +219,12 @@ def connect_to_services(config, verbose=True):
         print(f"Azure OpenAI connection failed: {str(e)}")
         raise
 
-    # Cosmos DB connection - Use AzureCliCredential instead of DefaultAzureCredential
-    try:
-        # Use AzureCliCredential like in cosmos_db.py
-        credential = AzureCliCredential()
-        cosmos_client = CosmosClient(config["cosmos_endpoint"], credential=credential)
-        
-        # Test connection
-        list(cosmos_client.list_databases())
-        if verbose:
-            print("Connected to Cosmos DB using AzureCliCredential")
-    except Exception as e:
-        print(f"Cosmos DB connection failed: {str(e)}")
-        
+    # Cosmos DB connection - Azure CLI login first, then the service principal.
+    # No probe request here: the first real query surfaces any auth error.
+    credential = get_azure_credential(config["tenant_id"], config["client_id"], config["client_secret"])
+    cosmos_client = CosmosClient(config["cosmos_endpoint"], credential=credential, **COSMOS_CLIENT_OPTIONS)
+    if verbose:
+        print("Cosmos DB client created (AzureCliCredential, then ClientSecretCredential)")
 
     connections["cosmos"] = cosmos_client
     database = cosmos_client.get_database_client(config["database_name"])
@@ -241,8 +248,8 @@ def process_input_file(file_path, verbose=True):
             
         # Try parsing as JSON
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
             print(f"Warning: The file is not valid JSON. Will attempt to extract information using GPT-4o.")
             return {"raw_text": content}
             
@@ -254,6 +261,86 @@ def process_input_file(file_path, verbose=True):
 # ----------------------------
 # Geospatial Indexing Functions
 # ----------------------------
+# Geocoding results persist across runs, since addresses repeat across customers
+GEOCODE_CACHE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "insurance_app_geocode.sqlite3")
+)
+# Addresses Nominatim could not find are retried after this many seconds
+GEOCODE_MISS_TTL = int(os.getenv("GEOCODE_MISS_TTL", "86400"))
+_geocoder = None
+_geocode_connection = None
+_geocode_lock = threading.Lock()
+
+def _get_geocoder():
+    """Create the rate-limited Nominatim geocoder once per process."""
+    global _geocoder
+    if _geocoder is None:
+        # geopy is only loaded when an address needs it
+        from geopy.geocoders import Nominatim
+        from geopy.extra.rate_limiter import RateLimiter
+        # Nominatim's usage policy allows one request per second; errors are raised,
+        # not swallowed, so a failed lookup is never cached as "not found"
+        _geocoder = RateLimiter(
+            Nominatim(user_agent="insurance_app").geocode, min_delay_seconds=1, swallow_exceptions=False
+        )
+    return _geocoder
+
+def _get_geocode_connection():
+    """Open the persistent geocoding cache once per process; returns None if it is unavailable."""
+    global _geocode_connection
+    if _geocode_connection is None:
+        try:
+            _geocode_connection = sqlite3.connect(GEOCODE_CACHE_PATH, check_same_thread=False)
+            _geocode_connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "addr TEXT PRIMARY KEY, lat REAL, lng REAL, ts INTEGER NOT NULL)"
+            )
+            _geocode_connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Geocoding cache unavailable at %s: %s", GEOCODE_CACHE_PATH, e)
+            _geocode_connection = False
+    return _geocode_connection or None
+
+@functools.lru_cache(maxsize=10000)
+def _geocode(address_key):
+    """
+    Return (lat, lng) for a normalized address, from the persistent cache or Nominatim.
+    
+    Raises:
+        LookupError: If the address was not found; raising keeps misses out of
+        the in-process cache, and the persistent cache expires them after
+        GEOCODE_MISS_TTL seconds
+    """
+    with _geocode_lock:
+        connection = _get_geocode_connection()
+        if connection is not None:
+            row = connection.execute(
+                "SELECT lat, lng, ts FROM geocodes WHERE addr = ?", (address_key,)
+            ).fetchone()
+            if row is not None:
+                if row[0] is not None:
+                    return row[0], row[1]
+                if time.time() - row[2] < GEOCODE_MISS_TTL:
+                    raise LookupError(address_key)
+    
+    location = _get_geocoder()(address_key)
+    coordinates = (location.latitude, location.longitude) if location else (None, None)
+    
+    with _geocode_lock:
+        if connection is not None:
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO geocodes (addr, lat, lng, ts) VALUES (?, ?, ?, ?)",
+                    (address_key, coordinates[0], coordinates[1], int(time.time()))
+                )
+                connection.commit()
+            except sqlite3.Error as e:
+                logger.warning("Could not persist geocoding result: %s", e)
+    if not location:
+        raise LookupError(address_key)
+    return coordinates
+
 def geocode_address(address, verbose=True):
     """Geocode address to get latitude and longitude coordinates"""
     # Build address string from components
@@ -288,14 +375,16 @@ def geocode_address(address, verbose=True):
         return None, None
     
     try:
-        # Use Nominatim for geocoding
-        geolocator = Nominatim(user_agent="insurance_app")
-        location = geolocator.geocode(address_str)
+        # Use Nominatim for geocoding, memoized per normalized address
+        try:
+            lat, lng = _geocode(address_str.lower().strip())
+        except LookupError:
+            lat, lng = None, None
         
-        if location:
+        if lat is not None and lng is not None:
             if verbose:
-                print(f"Geocoded address: {address_str} -> ({location.latitude}, {location.longitude})")
-            return location.latitude, location.longitude
+                print(f"Geocoded address: {address_str} -> ({lat}, {lng})")
+            return lat, lng
         else:
             if verbose:
                 print(f"Could not geocode address: {address_str}")
@@ -306,6 +395,11 @@ def geocode_address(address, verbose=True):
             print(f"Error during geocoding: {str(e)}")
         return None, None
 
+@functools.lru_cache(maxsize=4096)
+def _h3_neighbors(h3_index):
+    """Return the cell and its immediate ring; customers often share resolution-8 cells."""
+    return frozenset(h3.k_ring(h3_index, 1))
+
 def calculate_h3_index(customer_data, resolution=8, verbose=True):
     """Calculate H3 geonspatial index for customer address data"""
     try:
@@ -354,22 +448,38 @@ def calculate_h3_index(customer_data, resolution=8, verbose=True):
 # ----------------------------
 # Extract Customer Data Fields
 # ----------------------------
-def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verbose=True):
-    """Extract standardized fields from customer data for embedding and comparison"""
-    # If already structured properly, just return
-    if isinstance(customer_data, dict) and "dateOfBirth" in customer_data:
-        return customer_data
-        
-    current_year = datetime.datetime.now().year
-    
-    # Convert to JSON string for the prompt
-    if isinstance(customer_data, dict) and "raw_text" in customer_data:
-        prompt_text = customer_data["raw_text"]
-    else:
-        prompt_text = json.dumps(customer_data, indent=2)
-    
-    # Create comprehensive system prompt based on customerprofilingfields.txt
-    system_prompt = """
+# Lists that only appear once data is in the extraction schema (see format_customer_text)
+_STRUCTURED_LIST_FIELDS = ("insuredVehicles", "coveredDrivers")
+
+def _add_derived_fields(extracted_data, current_year, verbose=True):
+    """Add vehicle ages and the H3 location index to extracted customer data, in place."""
+    # Calculate vehicle age if year is provided but age is not
+    if "insuredVehicles" in extracted_data and isinstance(extracted_data["insuredVehicles"], list):
+        for vehicle in extracted_data["insuredVehicles"]:
+            if "year" in vehicle and "ageOfVehicle" not in vehicle:
+                try:
+                    vehicle_year = int(vehicle["year"])
+                    vehicle["ageOfVehicle"] = current_year - vehicle_year
+                except (ValueError, TypeError):
+                    pass
+    
+    # Calculate H3 geospatial index if address information is present
+    if "address" in extracted_data and isinstance(extracted_data["address"], dict):
+        h3_index = calculate_h3_index(extracted_data, resolution=8, verbose=verbose)
+        if h3_index:
+            extracted_data["h3_index"] = h3_index
+            
+            # Find neighboring H3 indices for proximity search
+            try:
+                extracted_data["h3_neighbors"] = set(_h3_neighbors(h3_index))
+            except Exception as e:
+                if verbose:
+                    print(f"Error calculating H3 neighbors: {str(e)}")
+
+# Extraction system prompt, based on customerprofilingfields.txt. Built once and kept
+# byte-identical across calls, with only the user message varying, so Azure OpenAI
+# can serve the shared prefix from its prompt cache
+_EXTRACTION_SYSTEM_PROMPT = """
     You are an AI assistant specialized in extracting insurance customer information.
     Extract the following fields (if present) from the provided text:
     
@@ -425,6 +535,40 @@ def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verb
     IMPORTANT: Return ONLY the raw JSON object. No code blocks or explanations.
     Include ONLY fields that you can find in the text. If a field is missing, omit it.
     """
+
+# Outermost {...} span, used only when a response is not bare JSON
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Optional prompt_cache_key routing hint; only sent when set, since older API
+# versions reject unknown request fields
+EXTRACTION_PROMPT_CACHE_KEY = os.getenv("EXTRACTION_PROMPT_CACHE_KEY")
+
+def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verbose=True):
+    """Extract standardized fields from customer data for embedding and comparison"""
+    # If already structured properly, just return
+    if isinstance(customer_data, dict) and "dateOfBirth" in customer_data:
+        return customer_data
+        
+    current_year = datetime.datetime.now().year
+    
+    # Input already in the extraction schema needs no GPT-4o round-trip, only
+    # the fields the extraction step derives
+    if isinstance(customer_data, dict) and all(
+        isinstance(customer_data.get(field), list) for field in _STRUCTURED_LIST_FIELDS
+    ):
+        if verbose:
+            print("Customer data is already structured; skipping GPT-4o extraction")
+        _add_derived_fields(customer_data, current_year, verbose)
+        return customer_data
+    
+    # Convert to JSON string for the prompt
+    if isinstance(customer_data, dict) and "raw_text" in customer_data:
+        prompt_text = customer_data["raw_text"]
+    else:
+        prompt_text = orjson.dumps(
+            customer_data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
     
     user_prompt = f"Extract insurance customer profile information from this text:\n\n{prompt_text}"
     
@@ -446,64 +590,30 @@ def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verb
         response = openai_client.chat.completions.create(
             model=gpt4o_deployment,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _EXTRACTION_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.0,
             max_tokens=1500,
             response_format={"type": "json_object"},  # Changed from "json" to "json_object"
-            timeout=30  # Azure best practice - set reasonable timeout
+            timeout=30,  # Azure best practice - set reasonable timeout
+            extra_body={"prompt_cache_key": EXTRACTION_PROMPT_CACHE_KEY} if EXTRACTION_PROMPT_CACHE_KEY else None
         )
         
         # Rest of the function remains the same...
-        # Process and clean the response
-        content = response.choices[0].message.content.strip()
-        
-        # Clean up markdown formatting if present
-        if "```" in content:
-            parts = content.split("```")
-            for i, part in enumerate(parts):
-                if part.strip().startswith("json") and i+1 < len(parts):
-                    content = parts[i+1].strip()
-                    break
-                elif part.strip().startswith("{"):
-                    content = part.strip()
-                    break
-        
-        # Remove trailing backticks
-        content = content.rstrip('`')
-        
-        # Find the JSON content if it doesn't start with '{'
-        if not content.startswith("{"):
-            start_idx = content.find("{")
-            if start_idx >= 0:
-                content = content[start_idx:]
+        # JSON mode guarantees a bare JSON object, so there is no fence or prefix to strip
+        content = response.choices[0].message.content
         
         try:
-            extracted_data = json.loads(content)
-            
-            # Calculate vehicle age if year is provided but age is not
-            if "insuredVehicles" in extracted_data and isinstance(extracted_data["insuredVehicles"], list):
-                for vehicle in extracted_data["insuredVehicles"]:
-                    if "year" in vehicle and "ageOfVehicle" not in vehicle:
-                        try:
-                            vehicle_year = int(vehicle["year"])
-                            vehicle["ageOfVehicle"] = current_year - vehicle_year
-                        except (ValueError, TypeError):
-                            pass
-            
-            # Calculate H3 geospatial index if address information is present
-            if "address" in extracted_data and isinstance(extracted_data["address"], dict):
-                h3_index = calculate_h3_index(extracted_data, resolution=8, verbose=verbose)
-                if h3_index:
-                    extracted_data["h3_index"] = h3_index
-                    
-                    # Find neighboring H3 indices for proximity search
-                    try:
-                        extracted_data["h3_neighbors"] = h3.k_ring(h3_index, 1)
-                    except Exception as e:
-                        if verbose:
-                            print(f"Error calculating H3 neighbors: {str(e)}")
+            try:
+                extracted_data = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # Cold path for a response that ignored JSON mode: one regex pass for the object
+                match = _JSON_OBJECT_RE.search(content)
+                if match is None:
+                    raise
+                extracted_data = orjson.loads(match.group(0))
+            _add_derived_fields(extracted_data, current_year, verbose)
             
             if verbose:
                 print("Successfully extracted structured customer data")
@@ -513,7 +623,7 @@ def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verb
             
             return extracted_data
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"Error parsing Azure OpenAI response: {str(e)}")
             print(f"Response preview: {content[:150]}...")
             return {}
@@ -527,30 +637,31 @@ def extract_customer_fields(customer_data, openai_client, gpt4o_deployment, verb
 # ----------------------------
 def format_customer_text(customer_data, verbose=True):
     """Format customer data as text for embedding"""
-    text = "Customer profile. "
+    # Collect the pieces and join once; the text (and so its embedding cache key) is unchanged
+    parts = ["Customer profile. "]
     
     # Add personal information
     if "fullName" in customer_data:
-        text += f"Name: {customer_data['fullName']}. "
+        parts.append(f"Name: {customer_data['fullName']}. ")
     
     if "dateOfBirth" in customer_data:
-        text += f"DOB: {customer_data['dateOfBirth']}. "
+        parts.append(f"DOB: {customer_data['dateOfBirth']}. ")
         
     if "gender" in customer_data:
-        text += f"Gender: {customer_data['gender']}. "
+        parts.append(f"Gender: {customer_data['gender']}. ")
         
     if "maritalStatus" in customer_data:
-        text += f"Marital status: {customer_data['maritalStatus']}. "
+        parts.append(f"Marital status: {customer_data['maritalStatus']}. ")
         
     if "occupation" in customer_data:
-        text += f"Occupation: {customer_data['occupation']}. "
+        parts.append(f"Occupation: {customer_data['occupation']}. ")
     
     # Add contact info
     if "email" in customer_data:
-        text += f"Email: {customer_data['email']}. "
+        parts.append(f"Email: {customer_data['email']}. ")
         
     if "phone" in customer_data:
-        text += f"Phone: {customer_data['phone']}. "
+        parts.append(f"Phone: {customer_data['phone']}. ")
     
     # Add address information with H3 index
     if "address" in customer_data:
@@ -567,23 +678,23 @@ def format_customer_text(customer_data, verbose=True):
             address_parts.append(addr["postalCode"])
             
         if address_parts:
-            text += f"Address: {', '.join(address_parts)}. "
+            parts.append(f"Address: {', '.join(address_parts)}. ")
     
     # Include H3 geospatial index if available
     if "h3_index" in customer_data:
-        text += f"Location H3: {customer_data['h3_index']}. "
+        parts.append(f"Location H3: {customer_data['h3_index']}. ")
     
     # Add vehicle information
     if "insuredVehicles" in customer_data and customer_data["insuredVehicles"]:
-        text += "Vehicles: "
-        for i, vehicle in enumerate(customer_data["insuredVehicles"]):
+        parts.append("Vehicles: ")
+        for vehicle in customer_data["insuredVehicles"]:
             details = []
             if "make" in vehicle:
-                details.append(f"{vehicle['make']}")
+                details.append(str(vehicle["make"]))
             if "model" in vehicle:
-                details.append(f"{vehicle['model']}")
+                details.append(str(vehicle["model"]))
             if "year" in vehicle:
-                details.append(f"{vehicle['year']}")
+                details.append(str(vehicle["year"]))
             if "ageOfVehicle" in vehicle:
                 details.append(f"{vehicle['ageOfVehicle']} years old")
             if "vehicleUsage" in vehicle:
@@ -591,54 +702,59 @@ def format_customer_text(customer_data, verbose=True):
             if "annualMileage" in vehicle:
                 details.append(f"{vehicle['annualMileage']} miles/year")
             
-            text += f"{', '.join(details)}. "
+            # One join per vehicle, appended with its separator
+            parts.append(", ".join(details))
+            parts.append(". ")
     
     # Add driver information
     if "coveredDrivers" in customer_data and customer_data["coveredDrivers"]:
-        text += "Drivers: "
-        for i, driver in enumerate(customer_data["coveredDrivers"]):
+        parts.append("Drivers: ")
+        for driver in customer_data["coveredDrivers"]:
             details = []
             if "dateOfBirth" in driver:
                 details.append(f"born {driver['dateOfBirth']}")
             if "relationship" in driver:
-                details.append(f"{driver['relationship']}")
+                details.append(str(driver["relationship"]))
             if "drivingHistory" in driver:
                 details.append(f"history: {driver['drivingHistory']}")
             
-            text += f"{', '.join(details)}. "
+            parts.append(", ".join(details))
+            parts.append(". ")
     
     # Add policy information
     if "policyType" in customer_data:
-        text += f"Policy type: {customer_data['policyType']}. "
+        parts.append(f"Policy type: {customer_data['policyType']}. ")
         
     if "policyNumber" in customer_data:
-        text += f"Policy number: {customer_data['policyNumber']}. "
+        parts.append(f"Policy number: {customer_data['policyNumber']}. ")
         
     if "policyEffectiveDate" in customer_data:
-        text += f"Effective: {customer_data['policyEffectiveDate']}. "
+        parts.append(f"Effective: {customer_data['policyEffectiveDate']}. ")
         
     if "policyExpirationDate" in customer_data:
-        text += f"Expiration: {customer_data['policyExpirationDate']}. "
+        parts.append(f"Expiration: {customer_data['policyExpirationDate']}. ")
     
     # Add coverage information
     if "coverage" in customer_data:
         coverage = customer_data["coverage"]
         if isinstance(coverage, dict):
             if "coverageTypes" in coverage:
-                text += f"Coverage types: {', '.join(coverage['coverageTypes'])}. "
+                parts.append(f"Coverage types: {', '.join(coverage['coverageTypes'])}. ")
             if "liabilityLimits" in coverage:
-                text += f"Liability limits: {coverage['liabilityLimits']}. "
+                parts.append(f"Liability limits: {coverage['liabilityLimits']}. ")
             if "deductibles" in coverage:
-                text += f"Deductibles: {coverage['deductibles']}. "
+                parts.append(f"Deductibles: {coverage['deductibles']}. ")
     
     # Add risk factors
     if "riskFactors" in customer_data:
         risk = customer_data["riskFactors"]
         if isinstance(risk, dict):
             if "priorClaims" in risk:
-                text += f"Prior claims: {risk['priorClaims']}. "
+                parts.append(f"Prior claims: {risk['priorClaims']}. ")
             if "creditScore" in risk:
-                text += f"Credit score range: {risk['creditScore']}. "
+                parts.append(f"Credit score range: {risk['creditScore']}. ")
+    
+    text = "".join(parts)
     
     if verbose:
         print(f"\nGenerated customer text profile:")
@@ -659,99 +775,502 @@ def get_embedding(text, openai_client, embedding_deployment, verbose=False):
     Returns:
         list: The embedding vector
     """
+    # A single text is a batch of one; it shares get_embeddings' cache keys and fallback
+    return get_embeddings([text], openai_client, embedding_deployment, verbose)[0]
+
+# Inputs per embeddings request; keeps batches within the deployment's per-request limit
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+
+def get_embeddings(texts, openai_client, embedding_deployment, verbose=False):
+    """
+    Generate embeddings for several texts, EMBEDDING_BATCH_SIZE per Azure OpenAI request.
+    
+    Parameters:
+        texts (list[str]): The texts to generate embeddings for
+        openai_client: Azure OpenAI client instance
+        embedding_deployment (str): Name of the embedding model deployment
+        verbose (bool): Whether to print verbose output
+        
+    Returns:
+        list[list]: One embedding vector per input text
+    """
     try:
-        # Log only when needed
         if verbose:
-            logger.info("Generating text embedding with Azure OpenAI")
+            logger.info("Generating %d text embeddings with Azure OpenAI", len(texts))
         
-        # Azure best practice: Set timeout and clear parameters
-        response = openai_client.embeddings.create(
-            input=text,
-            model=embedding_deployment,
-            dimensions=3072  # Explicitly set dimensions for text-embedding-3-large
-        )
+        def _compute_many(batch):
+            # One round-trip per EMBEDDING_BATCH_SIZE texts that missed the cache
+            embeddings = []
+            for start in range(0, len(batch), EMBEDDING_BATCH_SIZE):
+                chunk = batch[start:start + EMBEDDING_BATCH_SIZE]
+                response = openai_client.embeddings.create(
+                    input=chunk,
+                    model=embedding_deployment,
+                    dimensions=3072  # Explicitly set dimensions for text-embedding-3-large
+                )
+                
+                # Azure best practice: Validate response
+                if not response or len(response.data) != len(chunk):
+                    raise ValueError("Incomplete embedding response received")
+                
+                embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+            return embeddings
         
-        # Azure best practice: Validate response
-        if not response or not response.data or not response.data[0].embedding:
-            raise ValueError("Empty embedding response received")
-            
-        return response.data[0].embedding
+        return embedding_cache.get_many_or_compute(texts, f"{embedding_deployment}:3072", _compute_many)
         
     except Exception as e:
         # Azure best practice: Structured error logging
         logger.error(f"Azure OpenAI embedding error: {str(e)}")
         
-        # Return fallback embedding vector with correct dimensions
-        return [0.0] * 3072  # text-embedding-3-large has 3072 dimensions
-    
+        # Return fallback embedding vectors with correct dimensions
+        return [[0.0] * 3072 for _ in texts]
+
 # ----------------------------
 # Find Similar Customers
 # ----------------------------
-def find_similar_customers(customer_embedding, segments_container, top_n=3, verbose=True):
-    """Find most similar customer segments using cosine similarity"""
-    if verbose:
-        print(f"\nSearching for similar customer profiles...")
+# Rows upcast to float32 per scoring chunk; keeps the working set cache-sized
+_SCORE_CHUNK_ROWS = 4096
+
+# Config and service clients shared by every in-process call, set up on first use
+_services = None
+_services_lock = threading.Lock()
+
+# Batched calls extract and match up to this many customers at once; the work is
+# dominated by GPT-4o and Cosmos DB latency, so threads overlap the waits
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "10"))
+
+# Segment corpus cache; rebuilt from Cosmos DB after SEGMENT_INDEX_TTL seconds
+SEGMENT_INDEX_TTL = float(os.getenv("SEGMENT_INDEX_TTL", "300"))
+# Refreshes in between read only the change feed, which does not report deletes,
+# so the container is still rescanned in full this often
+SEGMENT_INDEX_RESCAN_INTERVAL = float(os.getenv("SEGMENT_INDEX_RESCAN_INTERVAL", "3600"))
+_segment_index = None
+# Held by the one thread rebuilding the index; the others keep serving the stale copy
+_segment_refresh_lock = threading.Lock()
+
+# On-disk copy of the segment index; worker processes memory-map the same file,
+# so only one of them has to rescan Cosmos DB per SEGMENT_INDEX_TTL
+SEGMENT_INDEX_DIR = os.getenv(
+    "SEGMENT_INDEX_DIR",
+    os.path.join(tempfile.gettempdir(), "insurance_app_segments")
+)
+# Segment fields kept next to the matrix; the matrix itself carries the embeddings
+_SEGMENT_FIELDS = ("id", "policyId", "feedback", "segment", "segmentInfo")
+
+# Server-side top-K with VectorDistance; needs the vector index that
+# customerprofiling.py defines on CustomerSegments.embedding
+COSMOS_VECTOR_SEARCH = os.getenv("COSMOS_VECTOR_SEARCH", "").lower() in ("1", "true", "yes")
+_VECTOR_SEARCH_QUERY = (
+    "SELECT TOP @k c.id, c.policyId, c.feedback, c.segment, c.segmentInfo, "
+    "VectorDistance(c.embedding, @q) AS similarity "
+    "FROM c ORDER BY VectorDistance(c.embedding, @q)"
+)
+
+# Full scans project only the fields used for ranking and display, so the large
+# policyText and the float embedding (when the int8 copy exists) are not shipped
+_SEGMENT_SCAN_QUERY = (
+    "SELECT c.id, c.policyId, c.feedback, c.segment, c.segmentInfo, "
+    "(IS_DEFINED(c.embeddingInt8) ? c.embeddingInt8 : c.embedding) AS embedding "
+    "FROM c WHERE IS_DEFINED(c.embeddingInt8) OR IS_DEFINED(c.embedding)"
+)
+_SIMILARITY_DEBUG_QUERY = "SELECT c.policyId, c.embedding FROM c"
+
+# HNSW settings used when faiss is installed and the corpus is large
+_ANN_MIN_SEGMENTS = 10000
+_HNSW_NEIGHBORS = 32
+# Candidates explored per query; faiss' default of 16 loses recall on large graphs
+_HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# IVF-PQ settings for very large corpora, where even float vectors no longer fit
+# comfortably in memory; 96 sub-quantizers of 8 bits keep 96 bytes per segment
+_IVFPQ_MIN_SEGMENTS = 200000
+_IVFPQ_SUBQUANTIZERS = 96
+_IVFPQ_PROBES = 16
+
+def _segment_matrix(segments, dimensions, verbose=False):
+    """
+    Stack segment embeddings into a row-normalized float16 matrix.
     
-    # Retrieve all customer segments with embeddings
-    try:
-        segments = list(segments_container.read_all_items(max_item_count=1000))
-        if verbose:
-            print(f"Retrieved {len(segments)} customer segments from database")
-            
-    except Exception as e:
-        print(f"Error retrieving customer segments: {str(e)}")
-        return []
+    The int8 embedding written at ingestion is used when present; its per-vector
+    scale cancels out under normalization. Segments without a usable embedding
+    (missing, wrong length, non-numeric, zero or non-finite) are skipped.
     
-    # Calculate similarity for each segment
-    similarities = []
+    Returns:
+        tuple: (segments kept, matrix of shape (len(kept), dimensions))
+    """
+    # Rows are written straight into one preallocated buffer, sized for every
+    # segment and trimmed to the usable ones, instead of stacking per-row arrays
+    matrix = np.empty((len(segments), dimensions), dtype=np.float32)
+    kept = []
     for segment in segments:
-        # Skip segments without embeddings
-        if "embedding" not in segment or not segment["embedding"]:
+        embedding = segment.get("embeddingInt8") or segment.get("embedding")
+        if not embedding:
             if verbose:
                 print(f"Skipping segment with ID {segment.get('id', 'unknown')}: no embedding")
             continue
-        
-        # Validate embeddings to prevent NaN results
-        if not all(isinstance(x, (int, float)) for x in customer_embedding) or \
-           not all(isinstance(x, (int, float)) for x in segment["embedding"]):
+        try:
+            if len(embedding) != dimensions:
+                raise ValueError("dimension mismatch")
+            matrix[len(kept)] = embedding
+        except (TypeError, ValueError):
             if verbose:
                 print(f"Skipping segment with ID {segment.get('id', 'unknown')}: invalid embedding type")
             continue
+        kept.append(segment)
+    
+    if not kept:
+        return [], np.empty((0, dimensions), dtype=np.float16)
+    
+    matrix = matrix[:len(kept)]
+    norms = np.linalg.norm(matrix, axis=1)
+    valid = np.isfinite(norms) & (norms > 0)
+    if not valid.all():
+        if verbose:
+            for i in np.flatnonzero(~valid):
+                print(f"Skipping segment with ID {kept[i].get('id', 'unknown')}: zero embedding")
+        kept = [segment for segment, ok in zip(kept, valid) if ok]
+        matrix, norms = matrix[valid], norms[valid]
+    
+    matrix /= norms[:, None]
+    # Half-precision storage halves the bytes streamed on every search
+    return kept, matrix.astype(np.float16)
+
+def _cosine_scores(matrix, unit_query):
+    """Score a normalized float16 matrix against a unit query, in float32 chunks."""
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], _SCORE_CHUNK_ROWS):
+        chunk = matrix[start:start + _SCORE_CHUNK_ROWS].astype(np.float32)
+        scores[start:start + _SCORE_CHUNK_ROWS] = chunk @ unit_query
+    return scores
+
+def _segment_index_paths(container_id, dimensions):
+    """Paths of the persisted matrix and segment metadata for a container."""
+    base = os.path.join(SEGMENT_INDEX_DIR, f"{container_id or 'segments'}_{dimensions}")
+    return base + ".npy", base + ".meta.json"
+
+def _read_segment_index_file(container_id, dimensions):
+    """
+    Load a persisted segment index that is younger than SEGMENT_INDEX_TTL.
+    
+    Returns:
+        tuple: (memory-mapped normalized matrix, segments, saved_at, change feed
+        state) or None when the files are missing, stale or inconsistent
+    """
+    matrix_path, meta_path = _segment_index_paths(container_id, dimensions)
+    try:
+        with open(meta_path, "rb") as f:
+            meta = orjson.loads(f.read())
+        if time.time() - meta["saved_at"] >= SEGMENT_INDEX_TTL:
+            return None
+        matrix = np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError, KeyError, orjson.JSONDecodeError):
+        return None
+    if matrix.shape != (len(meta["segments"]), dimensions):
+        return None
+    return matrix, meta["segments"], meta["saved_at"], meta.get("feed")
+
+def _write_segment_index_file(container_id, dimensions, candidates, matrix, saved_at, feed=None):
+    """Persist the normalized matrix and segment metadata, replacing files atomically."""
+    matrix_path, meta_path = _segment_index_paths(container_id, dimensions)
+    try:
+        os.makedirs(SEGMENT_INDEX_DIR, exist_ok=True)
+        tmp_suffix = f".{os.getpid()}.tmp"
+        with open(matrix_path + tmp_suffix, "wb") as f:
+            np.save(f, matrix)
+        os.replace(matrix_path + tmp_suffix, matrix_path)
+        with open(meta_path + tmp_suffix, "wb") as f:
+            f.write(orjson.dumps(
+                {"saved_at": saved_at, "feed": feed, "segments": candidates}, default=str
+            ))
+        os.replace(meta_path + tmp_suffix, meta_path)
+    except (OSError, TypeError) as e:
+        logger.warning("Could not persist segment index to %s: %s", SEGMENT_INDEX_DIR, e)
+
+def _build_faiss_index(matrix, dimensions):
+    """
+    Build the faiss inner-product index for a normalized segment matrix.
+    
+    Small corpora get an exact flat scan over the float32 rows, large ones an
+    approximate HNSW graph over 8-bit scalar-quantized rows, and very large ones
+    IVF-PQ (when dimensions split evenly into the sub-quantizers).
+    """
+    rows = np.ascontiguousarray(matrix, dtype=np.float32)
+    count = rows.shape[0]
+    if count >= _IVFPQ_MIN_SEGMENTS and dimensions % _IVFPQ_SUBQUANTIZERS == 0:
+        lists = int(4 * math.sqrt(count))
+        quantizer = faiss.IndexFlatIP(dimensions)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimensions, lists, _IVFPQ_SUBQUANTIZERS, 8, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(rows)
+        index.nprobe = _IVFPQ_PROBES
+    elif count >= _ANN_MIN_SEGMENTS:
+        # The graph walks 8-bit rows, a quarter of the bytes of float32 vectors
+        index = faiss.IndexHNSWSQ(
+            dimensions, faiss.ScalarQuantizer.QT_8bit, _HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(rows)
+        index.hnsw.efSearch = _HNSW_EF_SEARCH
+    else:
+        index = faiss.IndexFlatIP(dimensions)
+    index.add(rows)
+    return index
+
+def _segment_metadata(segment):
+    """Return the fields of a segment document that are cached alongside its matrix row."""
+    return {field: segment[field] for field in _SEGMENT_FIELDS if field in segment}
+
+def _read_segment_changes(segments_container, continuation):
+    """
+    Read the segments created or updated since continuation from the change feed.
+    
+    With no continuation the feed starts from now, which yields the token to
+    resume from after a full scan.
+    
+    Returns:
+        tuple: (changed segment documents, continuation token for the next read)
+    
+    Raises:
+        ValueError: If the response carried no continuation token, so callers
+        rescan instead of resuming from a token that may be out of date
+    """
+    headers = {}
+    changes = list(segments_container.query_items_change_feed(
+        is_start_from_beginning=False,
+        continuation=continuation,
+        max_item_count=1000,
+        response_hook=lambda response_headers, _: headers.update(response_headers)
+    ))
+    continuation = headers.get("etag")
+    if not continuation:
+        raise ValueError("change feed response carried no continuation token")
+    return changes, continuation
+
+def _merge_segment_changes(index, changes, dimensions, verbose=False):
+    """
+    Apply changed segment documents to a cached index.
+    
+    Known ids get their row and metadata replaced, new ids are appended.
+    
+    Returns:
+        tuple: (segments, normalized float16 matrix) for the merged corpus
+    """
+    # The feed can repeat an id across pages; its last version wins
+    latest = list({segment.get("id"): segment for segment in changes}.values())
+    fresh, rows = _segment_matrix(latest, dimensions, verbose)
+    if not fresh:
+        return index["candidates"], index["matrix"]
+    
+    candidates = list(index["candidates"])
+    positions = {segment.get("id"): i for i, segment in enumerate(candidates)}
+    # Writable copy, which also detaches the index from a memory-mapped file
+    matrix = np.array(index["matrix"], dtype=np.float16)
+    appended = []
+    for segment, row in zip(fresh, rows):
+        position = positions.get(segment.get("id"))
+        if position is None:
+            candidates.append(_segment_metadata(segment))
+            appended.append(row)
+        else:
+            candidates[position] = _segment_metadata(segment)
+            matrix[position] = row
+    if appended:
+        matrix = np.vstack([matrix, np.asarray(appended, dtype=np.float16)])
+    return candidates, matrix
+
+def _load_segment_index(segments_container, dimensions, verbose=False):
+    """
+    Return the cached segment index, rebuilding it when stale.
+    
+    The corpus is read from Cosmos DB, normalized and (with faiss installed)
+    loaded into a faiss index once, then reused for SEGMENT_INDEX_TTL seconds
+    instead of being rescanned on every call. The normalized matrix is also
+    persisted under SEGMENT_INDEX_DIR and memory-mapped by other processes while
+    it is fresh. Once the TTL expires, the index only reads the segments changed
+    since from the change feed, and rescans the container every
+    SEGMENT_INDEX_RESCAN_INTERVAL seconds. One thread refreshes at a time; the
+    others keep getting the stale index meanwhile instead of waiting on Cosmos DB.
+    """
+    global _segment_index
+    container_id = getattr(segments_container, "id", None)
+    index = _segment_index
+    if (index is None or index["container_id"] != container_id
+            or index["dimensions"] != dimensions):
+        index = None
+    elif time.monotonic() - index["loaded_at"] < SEGMENT_INDEX_TTL:
+        return index
+    
+    # With nothing to serve yet, wait for the refresh in progress
+    if not _segment_refresh_lock.acquire(blocking=index is None):
+        return index
+    try:
+        # Another thread may have refreshed while this one waited for the lock
+        current = _segment_index
+        if (current is not None and current["container_id"] == container_id
+                and current["dimensions"] == dimensions):
+            if time.monotonic() - current["loaded_at"] < SEGMENT_INDEX_TTL:
+                return current
+            index = current
+        _segment_index = _refresh_segment_index(segments_container, container_id, dimensions, index, verbose)
+        return _segment_index
+    finally:
+        _segment_refresh_lock.release()
+
+def _refresh_segment_index(segments_container, container_id, dimensions, index, verbose=False):
+    """
+    Build a fresh segment index, merging change feed updates into index when possible.
+    
+    Args:
+        index (dict): Stale index for this container and dimension count, or None
+    
+    Returns:
+        dict: The new index
+    """
+    changes = None
+    persisted = _read_segment_index_file(container_id, dimensions)
+    if persisted is not None:
+        matrix, candidates, saved_at, feed = persisted
+        if verbose:
+            print(f"Loaded {len(candidates)} customer segments from the segment index cache")
+    else:
+        feed = index["feed"] if index is not None else None
+        if feed and time.time() - feed["scanned_at"] < SEGMENT_INDEX_RESCAN_INTERVAL:
+            try:
+                changes, continuation = _read_segment_changes(segments_container, feed["continuation"])
+                feed = {"continuation": continuation, "scanned_at": feed["scanned_at"]}
+            except Exception as e:
+                logger.warning("Segment change feed read failed, rescanning segments: %s", e)
+        
+        if changes is not None:
+            candidates, matrix = _merge_segment_changes(index, changes, dimensions, verbose)
+            if verbose:
+                print(f"Applied {len(changes)} changed customer segments from the change feed")
+        else:
+            # Take the change feed position before scanning, so anything written
+            # during the scan is replayed (idempotently) on the next refresh
+            scanned_at = time.time()
+            try:
+                _, continuation = _read_segment_changes(segments_container, None)
+            except Exception as e:
+                logger.warning("Segment change feed unavailable, refreshes will rescan: %s", e)
+                continuation = None
+            feed = {"continuation": continuation, "scanned_at": scanned_at} if continuation else None
             
-        # Prevent division by zero in cosine calculation
-        if np.all(np.array(customer_embedding) == 0) or np.all(np.array(segment["embedding"]) == 0):
+            # Retrieve all customer segments with embeddings
+            segments = list(segments_container.query_items(
+                query=_SEGMENT_SCAN_QUERY, enable_cross_partition_query=True, max_item_count=1000
+            ))
             if verbose:
-                print(f"Skipping segment with ID {segment.get('id', 'unknown')}: zero embedding")
-            continue
+                print(f"Retrieved {len(segments)} customer segments from database")
             
+            candidates, matrix = _segment_matrix(segments, dimensions, verbose)
+            # The matrix carries the embeddings, so the cached (and persisted) segments
+            # keep only their metadata instead of a second copy as Python lists
+            candidates = [_segment_metadata(segment) for segment in candidates]
+        saved_at = time.time()
+        _write_segment_index_file(container_id, dimensions, candidates, matrix, saved_at, feed)
+    
+    if changes is not None and matrix is index["matrix"]:
+        # Nothing changed, so the faiss index is still current
+        ann = index["ann"]
+    else:
+        # faiss does the scan and top-K selection in SIMD code when it is installed
+        ann = _build_faiss_index(matrix, dimensions) if faiss is not None and candidates else None
+    
+    return {
+        "container_id": container_id,
+        "dimensions": dimensions,
+        # Age the in-memory copy from when the index was built, not when it was loaded
+        "loaded_at": time.monotonic() - (time.time() - saved_at),
+        "candidates": candidates,
+        "matrix": matrix,
+        "ann": ann,
+        "feed": feed
+    }
+
+def _query_similar_segments(segments_container, unit_query, top_n):
+    """Let Cosmos DB rank segments by cosine similarity and return the top N matches."""
+    items = segments_container.query_items(
+        query=_VECTOR_SEARCH_QUERY,
+        parameters=[
+            {"name": "@k", "value": int(top_n)},
+            {"name": "@q", "value": unit_query.tolist()}
+        ],
+        enable_cross_partition_query=True
+    )
+    return [
+        {
+            "segment": item,
+            "similarity": float(item.pop("similarity")),
+            "policy_id": item.get("policyId")
+        }
+        for item in items
+    ]
+
+def find_similar_customers(customer_embedding, segments_container, top_n=3, verbose=True, exact=False):
+    """
+    Find most similar customer segments using cosine similarity.
+    
+    With COSMOS_VECTOR_SEARCH set, Cosmos DB returns the top N through its vector
+    index. Otherwise, with faiss installed, segments are scored on an exact flat index
+    (or, for large corpora, an approximate HNSW or IVF-PQ index); pass exact=True to
+    score the float matrix instead.
+    """
+    if verbose:
+        print(f"\nSearching for similar customer profiles...")
+    
+    # Normalize the query once; a zero or non-finite query matches nothing
+    query = np.asarray(customer_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if query.ndim != 1 or not np.isfinite(query_norm) or query_norm == 0:
+        if verbose:
+            print("Skipping similarity search: invalid or zero customer embedding")
+        return []
+    unit_query = query / query_norm
+    
+    if COSMOS_VECTOR_SEARCH and not exact and top_n > 0:
         try:
-            # Calculate cosine similarity (1 - cosine distance)
-            # Use try-except to handle potential numerical issues
-            similarity = 1 - cosine(customer_embedding, segment["embedding"])
-            
-            # Check if similarity is a valid number
-            if np.isnan(similarity) or np.isinf(similarity):
-                if verbose:
-                    print(f"Warning: Invalid similarity result for segment {segment.get('id', 'unknown')}")
-                continue
-                
-            # Add to results
-            similarities.append({
-                "segment": segment,
-                "similarity": similarity,
-                "policy_id": segment.get("policyId")
-            })
-            
-        except Exception as e:
+            top_matches = _query_similar_segments(segments_container, unit_query, top_n)
             if verbose:
-                print(f"Error calculating similarity for segment {segment.get('id', 'unknown')}: {str(e)}")
-            continue
+                print(f"Found {len(top_matches)} similar customer profiles")
+            return top_matches
+        except Exception as e:
+            # Fall back to the local index, e.g. when the container has no vector index yet
+            logger.warning("Vector search query failed, scanning segments locally: %s", e)
     
-    # Sort by similarity (highest first)
-    similarities.sort(key=lambda x: x["similarity"], reverse=True)
+    try:
+        index = _load_segment_index(segments_container, query.shape[0], verbose)
+    except Exception as e:
+        print(f"Error retrieving customer segments: {str(e)}")
+        return []
     
-    # Return top N matches
-    top_matches = similarities[:top_n]
+    candidates = index["candidates"]
+    if not candidates or top_n <= 0:
+        return []
+    k = min(top_n, len(candidates))
+    
+    if index["ann"] is not None and not exact:
+        # faiss search: inner product on unit vectors is cosine similarity
+        scores, ids = index["ann"].search(unit_query.reshape(1, -1), k)
+        hits = [(int(i), float(score)) for i, score in zip(ids[0], scores[0]) if i >= 0]
+    else:
+        # Cosine similarity against every segment in one matrix-vector product
+        scores = _cosine_scores(index["matrix"], unit_query)
+        
+        # Select the top N without sorting the whole corpus; partitioning from the
+        # top end avoids negating (and copying) every score first
+        top_idx = np.argpartition(scores, -k)[-k:]
+        top_idx = top_idx[np.argsort(-scores[top_idx])]
+        hits = [(int(i), float(scores[i])) for i in top_idx]
+    
+    top_matches = [
+        {
+            "segment": candidates[i],
+            "similarity": score,
+            "policy_id": candidates[i].get("policyId")
+        }
+        for i, score in hits
+    ]
     
     if verbose:
         print(f"Found {len(top_matches)} similar customer profiles")
@@ -760,8 +1279,15 @@ def find_similar_customers(customer_embedding, segments_container, top_n=3, verb
 # ----------------------------
 # Retrieve Policy Details
 # ----------------------------
+# Parameterized so Cosmos DB can reuse the query plan (and ids are never spliced into SQL)
+_POLICY_BY_ID_QUERY = "SELECT * FROM c WHERE c.id = @id"
+_POLICY_BY_NUMBER_QUERY = "SELECT * FROM c WHERE c.policyNumber = @policyNumber"
+
 def get_policy_details(policy_id, policy_container, verbose=True):
     """Retrieve full policy information from policy container"""
+    # Imported with the other Azure SDK modules only once services are in use
+    from azure.cosmos.exceptions import CosmosResourceNotFoundError
+    
     if verbose:
         print(f"Retrieving policy details for ID: {policy_id}")
         
@@ -769,11 +1295,14 @@ def get_policy_details(policy_id, policy_container, verbose=True):
         # Try to retrieve by ID directly
         policy = policy_container.read_item(item=policy_id, partition_key=policy_id)
         return policy
-    except Exception:
-        # If direct lookup fails, try cross-partition query
+    except CosmosResourceNotFoundError:
+        # Only a 404 means the id is not the partition key; try cross-partition query
         try:
-            query = f"SELECT * FROM c WHERE c.id = '{policy_id}'"
-            items = list(policy_container.query_items(query=query, enable_cross_partition_query=True))
+            items = list(policy_container.query_items(
+                query=_POLICY_BY_ID_QUERY,
+                parameters=[{"name": "@id", "value": policy_id}],
+                enable_cross_partition_query=True
+            ))
             
             if items:
                 return items[0]
@@ -781,10 +1310,14 @@ def get_policy_details(policy_id, policy_container, verbose=True):
             if verbose:
                 print(f"Error querying by ID: {str(e)}")
                 
-        # Try looking up by policyNumber
+        # Try looking up by policyNumber, the Policy container's partition key,
+        # so the query stays within a single partition
         try:
-            query = f"SELECT * FROM c WHERE c.policyNumber = '{policy_id}'"
-            items = list(policy_container.query_items(query=query, enable_cross_partition_query=True))
+            items = list(policy_container.query_items(
+                query=_POLICY_BY_NUMBER_QUERY,
+                parameters=[{"name": "@policyNumber", "value": policy_id}],
+                partition_key=policy_id
+            ))
             
             if items:
                 return items[0]
@@ -794,6 +1327,21 @@ def get_policy_details(policy_id, policy_container, verbose=True):
                 print(f"Error querying by policyNumber: {str(e)}")
                 
         return None
+    except Exception as e:
+        # Other failures (already retried by the SDK) would hit the fallback queries
+        # too, so report them instead of issuing those
+        logger.warning("Policy lookup for %s failed: %s", policy_id, e)
+        return None
+
+# Shared pool for concurrent policy lookups, so K matches cost one round-trip of latency
+_policy_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="policy-lookup")
+
+def get_policy_details_many(policy_ids, policy_container, verbose=False):
+    """Retrieve several policies concurrently; returns them in the order of policy_ids."""
+    return list(_policy_lookup_executor.map(
+        lambda policy_id: get_policy_details(policy_id, policy_container, verbose),
+        policy_ids
+    ))
 
 def extract_coverage_details(policy):
     """Extract coverage information from policy"""
@@ -885,7 +1433,9 @@ def display_all_similarity_scores(customer_embedding, segments_container, verbos
     
     # Retrieve all customer segments with embeddings
     try:
-        segments = list(segments_container.read_all_items(max_item_count=1000))
+        segments = list(segments_container.query_items(
+            query=_SIMILARITY_DEBUG_QUERY, enable_cross_partition_query=True, max_item_count=1000
+        ))
         if verbose:
             print(f"Retrieved {len(segments)} total customer segments from database")
             
@@ -916,44 +1466,64 @@ def display_all_similarity_scores(customer_embedding, segments_container, verbos
     
     valid_similarities = []
     
+    # Classify every segment first, collecting the scorable embeddings as matrix rows
+    query = np.asarray(customer_embedding, dtype=np.float64)
+    query_ok = query.ndim == 1 and all(isinstance(x, (int, float)) for x in customer_embedding)
+    query_zero = query_ok and not query.any()
+    statuses = []
+    # Scorable rows are copied into one preallocated buffer, trimmed after the loop
+    matrix = np.empty((len(segments), query.shape[0] if query_ok else 0), dtype=np.float64)
+    count = 0
     for segment in segments:
-        policy_id = segment.get("policyId", "unknown")
-        status = "Unknown"
-        similarity_value = None
+        embedding = segment.get("embedding")
         
         # Check if segment has embedding
-        if "embedding" not in segment or not segment["embedding"]:
-            status = "No embedding"
+        if not embedding:
+            statuses.append("No embedding")
             stats["no_embedding"] += 1
         
         # Validate embeddings
-        elif not all(isinstance(x, (int, float)) for x in customer_embedding) or \
-             not all(isinstance(x, (int, float)) for x in segment["embedding"]):
-            status = "Invalid embedding"
+        elif not query_ok or not all(isinstance(x, (int, float)) for x in embedding):
+            statuses.append("Invalid embedding")
             stats["invalid_embedding"] += 1
-            
-        # Check for zero embeddings
-        elif np.all(np.array(customer_embedding) == 0) or np.all(np.array(segment["embedding"]) == 0):
-            status = "Zero embedding"
-            stats["zero_embedding"] += 1
-            
+        
+        elif len(embedding) != query.shape[0]:
+            statuses.append("Error: dimension mismatch")
+            stats["error"] += 1
+        
         else:
-            try:
-                # Calculate cosine similarity
-                similarity_value = 1 - cosine(customer_embedding, segment["embedding"])
-                
-                # Check if result is valid
-                if np.isnan(similarity_value) or np.isinf(similarity_value):
-                    status = "NaN/Inf result"
-                    stats["nan_result"] += 1
-                else:
-                    status = "Valid"
-                    stats["valid"] += 1
-                    valid_similarities.append(similarity_value)
-                    
-            except Exception as e:
-                status = f"Error: {str(e)[:20]}..."
-                stats["error"] += 1
+            matrix[count] = embedding
+            # Check for zero embeddings
+            if query_zero or not matrix[count].any():
+                statuses.append("Zero embedding")
+                stats["zero_embedding"] += 1
+            else:
+                statuses.append(count)
+                count += 1
+    
+    # Cosine similarity for all scorable segments in one matrix-vector product
+    similarities = np.empty(0)
+    if count:
+        matrix = matrix[:count]
+        # The query is normalized once, so only the segment norms divide the dot products
+        unit_query = query / np.linalg.norm(query)
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            similarities = (matrix @ unit_query) / np.linalg.norm(matrix, axis=1)
+    
+    for segment, status in zip(segments, statuses):
+        policy_id = segment.get("policyId", "unknown")
+        similarity_value = None
+        
+        if not isinstance(status, str):
+            similarity_value = float(similarities[status])
+            # Check if result is valid
+            if math.isnan(similarity_value) or math.isinf(similarity_value):
+                status = "NaN/Inf result"
+                stats["nan_result"] += 1
+            else:
+                status = "Valid"
+                stats["valid"] += 1
+                valid_similarities.append(similarity_value)
         
         # Format similarity string
         if similarity_value is not None:
@@ -1002,24 +1572,9 @@ def summarize_recommendations(matches):
             if "premium" in coverage and coverage["premium"]:
                 all_premiums.append(coverage["premium"])
     
-    # Count occurrences
-    coverage_counts = {}
-    for item in all_coverages:
-        if item in coverage_counts:
-            coverage_counts[item] += 1
-        else:
-            coverage_counts[item] = 1
-            
-    addon_counts = {}
-    for item in all_addons:
-        if item in addon_counts:
-            addon_counts[item] += 1
-        else:
-            addon_counts[item] = 1
-    
-    # Sort by frequency
-    sorted_coverages = sorted(coverage_counts.items(), key=lambda x: x[1], reverse=True)
-    sorted_addons = sorted(addon_counts.items(), key=lambda x: x[1], reverse=True)
+    # Count occurrences, most frequent first
+    sorted_coverages = Counter(all_coverages).most_common()
+    sorted_addons = Counter(all_addons).most_common()
     
     # Display recommendations
     print("\n=== RECOMMENDED COVERAGES ===")
@@ -1107,9 +1662,10 @@ def main():
     
     # Retrieve policy details for each similar customer
     print("\n=== MATCHING CUSTOMER PROFILES ===")
-    for idx, match in enumerate(similar_customers):
-        policy_id = match["policy_id"]
-        policy = get_policy_details(policy_id, connections["policy_container"], verbose=False)
+    policies = get_policy_details_many(
+        [match["policy_id"] for match in similar_customers], connections["policy_container"]
+    )
+    for idx, (match, policy) in enumerate(zip(similar_customers, policies)):
         coverage_details = extract_coverage_details(policy)
         
         # Add coverage details to match for summarization
@@ -1121,33 +1677,83 @@ def main():
     # Generate recommendation summary
     summarize_recommendations(similar_customers)
 
+def _get_services():
+    """
+    Return (config, connections) for the in-process matcher.
+    
+    Clients are created and the Azure OpenAI configuration is validated once per
+    process, instead of on every call, so repeated Hera calls only pay for the
+    actual extraction, embedding and search work.
+    """
+    global _services
+    with _services_lock:
+        if _services is None:
+            config = initialize_configs(verbose=False)
+            connections = connect_to_services(config, verbose=False)
+            
+            # Validate Azure OpenAI configuration once
+            validate_azure_openai_configuration(config, connections)
+            _services = (config, connections)
+    return _services
+
+def _prepare_customer(customer_data, config, connections):
+    """Add garaging H3 indices and extract the structured fields used for embedding."""
+    # Calculate garaging H3 index if ZIP code exists
+    vehicles = customer_data.get("vehicles", [])
+    for vehicle in vehicles:
+        garaging_zip = vehicle.get("garagingZip")
+        if garaging_zip:
+            lat, lng = geocode_address({"postalCode": garaging_zip}, verbose=False)
+            if lat and lng:
+                vehicle["garagingH3Index"] = h3.geo_to_h3(lat, lng, resolution=8)
+
+    # Extract structured fields
+    return extract_customer_fields(
+        customer_data,
+        connections["openai"],
+        config["gpt4o_deployment"],
+        verbose=False
+    )
+
+def _closest_policies(customer_embedding, connections):
+    """Find the top 3 similar customers and collect their policy coverages."""
+    similar_customers = find_similar_customers(
+        customer_embedding,
+        connections["segments_container"],
+        top_n=3,
+        verbose=False
+    )
+
+    result = {"TOP_3_CLOSEST_POLICIES": []}
+
+    policies = get_policy_details_many(
+        [match["policy_id"] for match in similar_customers], connections["policy_container"]
+    )
+    for match, policy in zip(similar_customers, policies):
+        policy_id = match["policy_id"]
+        coverage_details = extract_coverage_details(policy)
+
+        result_entry = {
+            "policyId": policy_id,
+            "similarityScore": match["similarity"],
+            "coverages": coverage_details.get("coverages", []),
+            "limits": coverage_details.get("limits", {}),
+            "deductibles": coverage_details.get("deductibles", {}),
+            "addOns": coverage_details.get("addOns", []),
+            "premium": coverage_details.get("premium")
+        }
+
+        result["TOP_3_CLOSEST_POLICIES"].append(result_entry)
+
+    return result
+
 def call_customerprofile(customer_data: dict) -> dict:
   
     logger.info("Starting customer profile processing")
     try:
-        verbose = False
-        config = initialize_configs(verbose=False)
-        connections = connect_to_services(config, verbose=False)
-        
-        # Validate Azure OpenAI configuration silently
-        is_valid = validate_azure_openai_configuration(config, connections)
-
-        # Calculate garaging H3 index if ZIP code exists
-        vehicles = customer_data.get("vehicles", [])
-        for vehicle in vehicles:
-            garaging_zip = vehicle.get("garagingZip")
-            if garaging_zip:
-                lat, lng = geocode_address({"postalCode": garaging_zip}, verbose=False)
-                if lat and lng:
-                    vehicle["garagingH3Index"] = h3.geo_to_h3(lat, lng, resolution=8)
-
-        # Extract structured fields
-        extracted_data = extract_customer_fields(
-            customer_data,
-            connections["openai"],
-            config["gpt4o_deployment"],
-            verbose=False
-        )
+        config, connections = _get_services()
+
+        extracted_data = _prepare_customer(customer_data, config, connections)
         print("I a done with extracting data with gpt4o)")
         
         # Generate embedding
@@ -1160,53 +1766,90 @@ def call_customerprofile(customer_data: dict) -> dict:
         )
         
         # Find top 3 similar customers
-        similar_customers = find_similar_customers(
-            customer_embedding,
-            connections["segments_container"],
-            top_n=3,
-            verbose=False
-        )
-
-        result = {"TOP_3_CLOSEST_POLICIES": []}
-
-        for match in similar_customers:
-            policy_id = match["policy_id"]
-            policy = get_policy_details(policy_id, connections["policy_container"], verbose=False)
-            coverage_details = extract_coverage_details(policy)
-
-            result_entry = {
-                "policyId": policy_id,
-                "similarityScore": match["similarity"],
-                "coverages": coverage_details.get("coverages", []),
-                "limits": coverage_details.get("limits", {}),
-                "deductibles": coverage_details.get("deductibles", {}),
-                "addOns": coverage_details.get("addOns", []),
-                "premium": coverage_details.get("premium")
-            }
-
-            result["TOP_3_CLOSEST_POLICIES"].append(result_entry)
-
-        return result
+        return _closest_policies(customer_embedding, connections)
 
     except Exception as e:
         return {
             "TOP_3_CLOSEST_POLICIES": [],
             "error": str(e)
         }
+
+def call_customerprofile_batch(customer_data_list: list) -> list:
+    """
+    Match several customer payloads, embedding all of them in one request.
+    
+    Args:
+        customer_data_list (list[dict]): Customer profile payloads
+        
+    Returns:
+        list[dict]: One call_customerprofile-style result per payload
+    """
+    logger.info("Starting batched customer profile processing for %d payloads", len(customer_data_list))
+    try:
+        config, connections = _get_services()
+
+        # The pool lives only for this batch, so importing the module starts no threads
+        with ThreadPoolExecutor(
+            max_workers=EXTRACTION_CONCURRENCY, thread_name_prefix="profile-batch"
+        ) as executor:
+            # GPT-4o extractions run concurrently, at most EXTRACTION_CONCURRENCY in flight
+            customer_texts = list(executor.map(
+                lambda customer_data: format_customer_text(
+                    _prepare_customer(customer_data, config, connections), verbose=False
+                ),
+                customer_data_list
+            ))
+            
+            # One embeddings round-trip for the whole batch
+            customer_embeddings = get_embeddings(
+                customer_texts,
+                connections["openai"],
+                config["embedding_deployment"],
+                verbose=False
+            )
+            
+            return list(executor.map(
+                lambda embedding: _closest_policies(embedding, connections), customer_embeddings
+            ))
+
+    except Exception as e:
+        return [
+            {"TOP_3_CLOSEST_POLICIES": [], "error": str(e)}
+            for _ in customer_data_list
+        ]
+
+def run(customer_data: dict) -> dict:
+    """
+    In-process entry point for the profile matcher.
     
+    Callers import this instead of launching customerprofile.py as a script, so
+    no interpreter start-up, temp file or stdout parsing is involved.
+    
+    Args:
+        customer_data (dict): Customer profile information
+        
+    Returns:
+        dict: {"TOP_3_CLOSEST_POLICIES": [...]} plus "error" on failure
+    """
+    return call_customerprofile(customer_data)
+
+def run_batch(customer_data_list: list) -> list:
+    """Batched form of run(): one result dict per payload, sharing one embeddings call."""
+    return call_customerprofile_batch(customer_data_list)
+
 if __name__ == "__main__":
     # Parse command line arguments properly
     args = parse_arguments()
     
-    # Use the parsed input file argument
-    input_file = args.input
-    
-    # Load customer data from the provided JSON file
-    with open(input_file, "r") as f:
-        customer_data = json.load(f)
+    # Load customer data in one read, from stdin (no temp file needed) or the input file
+    if args.stdin:
+        customer_data = orjson.loads(sys.stdin.buffer.read())
+    else:
+        with open(args.input, "rb") as f:
+            customer_data = orjson.loads(f.read())
     
-    # Call the main processing function
-    output = call_customerprofile(customer_data)
+    # A JSON array is matched as one batch, sharing a single embeddings request
+    output = run_batch(customer_data) if isinstance(customer_data, list) else run(customer_data)
     
     # Print the output JSON
-    print(json.dumps(output, indent=4))
\ No newline at end of file
+    print(orjson.dumps(output, option=orjson.OPT_INDENT_2).decode())
\ No newline at end of file
@@ -3,21 +3,20 @@
 # and stores the segmented data back in Cosmos DB
 
 import os
-from dotenv import load_dotenv
+from env import load_env
 import numpy as np
 import json
 import datetime
 from azure.cosmos import CosmosClient, PartitionKey
 from sklearn.cluster import KMeans
-from openai import AzureOpenAI
-from azure.identity import AzureCliCredential, ClientSecretCredential
+from clients import get_azure_client, get_azure_credential, COSMOS_CLIENT_OPTIONS
 
 # ----------------------------
 # 1. Load Configuration from Environment Variables
 # ----------------------------
 
 # Load variables from x1.env file
-load_dotenv("x1.env")
+load_env("x1.env")
 
 # Azure OpenAI configuration
 openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -63,42 +62,16 @@ print(f"GPT-4o model: {gpt4o_model}, deployment: {gpt4o_deployment}")
 # ----------------------------
 
 # Initialize Azure OpenAI client
-azure_openai_client = AzureOpenAI(
-    api_key=openai_api_key,
-    api_version=api_version,
-    azure_endpoint=openai_endpoint
-)
+azure_openai_client = get_azure_client(openai_api_key, openai_endpoint, api_version)
 
 # ----------------------------
 # 3. Initialize Cosmos DB with Azure AD Authentication
 # ----------------------------
 
-try:
-    # Option 1: Try using AzureCliCredential first (if you're logged in via CLI)
-    print("Attempting to connect with AzureCliCredential...")
-    credential = AzureCliCredential()
-    client = CosmosClient(cosmos_endpoint, credential=credential)
-    
-    # Test connection
-    list(client.list_databases())
-    print("Successfully connected using AzureCliCredential")
-    
-except Exception as e:
-    print(f"AzureCliCredential failed: {e}")
-    # Option 2: Fall back to ClientSecretCredential
-    print("Attempting to connect with ClientSecretCredential...")
-    try:
-        credential = ClientSecretCredential(tenant_id, client_id, client_secret)
-        client = CosmosClient(cosmos_endpoint, credential=credential)
-        
-        # Test connection
-        list(client.list_databases())
-        print("Successfully connected using ClientSecretCredential")
-        
-    except Exception as e:
-        print(f"ClientSecretCredential also failed: {e}")
-        print("Could not connect to Cosmos DB. Exiting.")
-        exit(1)
+# Azure CLI login first, then the service principal; no probe request here,
+# the first real query surfaces any auth error
+credential = get_azure_credential(tenant_id, client_id, client_secret)
+client = CosmosClient(cosmos_endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
 
 # ----------------------------
 # 4. Define Helper Functions
@@ -284,21 +257,56 @@ def format_policy_for_embedding(policy):
     
     return policy_text
 
+# Inputs per embeddings request; keeps batches within the deployment's per-request limit
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+
+def get_text_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Use Azure OpenAI service to generate embeddings for a list of texts.
+    
+    Texts are sent batch_size per request, so N policies cost ceil(N / batch_size)
+    round-trips instead of N. Embeddings are returned in input order.
+    """
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        try:
+            # Using the Azure OpenAI client
+            response = azure_openai_client.embeddings.create(
+                input=chunk,
+                model=embedding_deployment
+            )
+            if len(response.data) != len(chunk):
+                raise ValueError("Incomplete embedding response received")
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        except Exception as e:
+            print(f"Error generating embeddings for texts {start}-{start + len(chunk) - 1}: {e}")
+            # Return zero vectors as fallback (adjust dimension for text-embedding-3-large)
+            embeddings.extend([0.0] * 3072 for _ in chunk)  # text-embedding-3-large has 3072 dimensions
+    return embeddings
+
 def get_text_embedding(text):
     """
     Use Azure OpenAI service to generate embeddings for a given text.
     """
-    try:
-        # Using the Azure OpenAI client
-        response = azure_openai_client.embeddings.create(
-            input=text,
-            model=embedding_deployment
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        # Return a zero vector as fallback (adjust dimension for text-embedding-3-large)
-        return [0.0] * 3072  # text-embedding-3-large has 3072 dimensions
+    return get_text_embeddings([text])[0]
+
+def quantize_embedding(embedding):
+    """
+    Quantize an embedding to int8 with one per-vector scale.
+    
+    Stored alongside the float embedding so the matcher can read a quarter of
+    the bytes. The matcher normalizes every row, which cancels the scale, so
+    the scale itself is not stored.
+    
+    Returns:
+        list: int8 values
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = max_abs / 127 if max_abs > 0 else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return quantized.tolist()
 
 # ----------------------------
 # 5. Access Database and Retrieve Data
@@ -404,7 +412,7 @@ if policy_texts:
 
 # Generate embeddings for policy texts
 print("\nGenerating embeddings for policy data...")
-embeddings = np.array([get_text_embedding(text) for text in policy_texts])
+embeddings = np.array(get_text_embeddings(policy_texts))
 print(f"Generated embeddings with shape: {embeddings.shape}")
 
 # ----------------------------
@@ -453,7 +461,26 @@ try:
         segments_container = database.create_container(
             id=segments_container_name,
             partition_key=PartitionKey(path="/segment"),
-            default_ttl=None  # No automatic expiration for embedding data
+            default_ttl=None,  # No automatic expiration for embedding data
+            # Vector index so customerprofile.py can rank segments server-side with VectorDistance
+            vector_embedding_policy={
+                "vectorEmbeddings": [{
+                    "path": "/embedding",
+                    "dataType": "float32",
+                    "distanceFunction": "cosine",
+                    "dimensions": 3072  # text-embedding-3-large
+                }]
+            },
+            indexing_policy={
+                "indexingMode": "consistent",
+                "includedPaths": [{"path": "/*"}],
+                "excludedPaths": [
+                    {"path": "/\"_etag\"/?"},
+                    {"path": "/embedding/*"},
+                    {"path": "/embeddingInt8/*"}
+                ],
+                "vectorIndexes": [{"path": "/embedding", "type": "diskANN"}]
+            }
         )
         print(f"Container {segments_container_name} created successfully with partition key '/segment'")
 except Exception as e:
@@ -468,6 +495,7 @@ for idx, (policy_text, segment) in enumerate(zip(policy_texts, labels)):
     
     # Convert numpy array to list for JSON serialization
     embedding_vector = embeddings[idx].tolist()
+    embedding_int8 = quantize_embedding(embeddings[idx])
     
     item = {
         "id": f"segment_{original_id}",
@@ -475,7 +503,8 @@ for idx, (policy_text, segment) in enumerate(zip(policy_texts, labels)):
         "policyText": policy_text,
         "segment": int(segment),
         "segmentInfo": f"Customer Group {int(segment)}",
-        "embedding": embedding_vector
+        "embedding": embedding_vector,
+        "embeddingInt8": embedding_int8
     }
     segments_container.upsert_item(item)
 
@@ -1,6 +1,7 @@
 import os
 import logging
 from azure.cosmos import CosmosClient, exceptions
+from clients import COSMOS_CLIENT_OPTIONS
 from azure.identity import (
     ManagedIdentityCredential,
     AzureCliCredential,
@@ -56,7 +57,7 @@ class CosmosConnectionManager:
         # 1. Managed Identity
         try:
             credential = ManagedIdentityCredential()
-            client = CosmosClient(self.endpoint, credential=credential)
+            client = CosmosClient(self.endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
             # Test with a lightweight call
             list(client.list_databases())
             logger.info("Connected using ManagedIdentityCredential")
@@ -68,7 +69,7 @@ class CosmosConnectionManager:
         # 2. Azure CLI
         try:
             credential = AzureCliCredential()
-            client = CosmosClient(self.endpoint, credential=credential)
+            client = CosmosClient(self.endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
             list(client.list_databases())
             logger.info("Connected using AzureCliCredential")
             CosmosConnectionManager._client = client
@@ -84,7 +85,7 @@ class CosmosConnectionManager:
                     client_id=self.client_id,
                     client_secret=self.client_secret
                 )
-                client = CosmosClient(self.endpoint, credential=credential)
+                client = CosmosClient(self.endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
                 list(client.list_databases())
                 logger.info("Connected using ClientSecretCredential")
                 CosmosConnectionManager._client = client
@@ -98,7 +99,7 @@ class CosmosConnectionManager:
                 exclude_managed_identity_credential=True,
                 exclude_cli_credential=True
             )
-            client = CosmosClient(self.endpoint, credential=credential)
+            client = CosmosClient(self.endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
             list(client.list_databases())
             logger.info("Connected using DefaultAzureCredential")
             CosmosConnectionManager._client = client
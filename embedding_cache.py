@@ -0,0 +1,154 @@
+"""
+Two-tier cache for customer-profile embeddings.
+
+The same customer text is embedded by Iris, Mnemosyne and Ares during one
+session. The first tier is an in-process LRU. The second tier is a SQLite TTL
+store shared across processes and restarts. Vectors are stored as float16
+bytes, and keys are partitioned by embedding model and dimensions.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import orjson
+
+# Azure Best Practice: Configure module-level logger
+logger = logging.getLogger(__name__)
+
+# Cache settings, overridable from the environment
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "insurance_app_embeddings.sqlite3")
+)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+DEFAULT_TTL = 86400  # One day
+
+# Global state, created on first use
+_memory_cache = OrderedDict()
+_sqlite_connection = None
+_lock = threading.Lock()
+
+def cache_key(data, model):
+    """Return the cache key for data (text or JSON-serializable) under the given model."""
+    payload = data if isinstance(data, str) else orjson.dumps(
+        data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+    return hashlib.blake2b((model + "\x00" + payload).encode("utf-8"), digest_size=32).hexdigest()
+
+def _get_connection():
+    """Open the SQLite store once per process; returns None if it is unavailable."""
+    global _sqlite_connection
+    if _sqlite_connection is None:
+        try:
+            _sqlite_connection = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+            _sqlite_connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            _sqlite_connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache store unavailable at %s: %s", EMBEDDING_CACHE_PATH, e)
+            _sqlite_connection = False
+    return _sqlite_connection or None
+
+def _remember(key, vector):
+    """Put vector in the in-process LRU, evicting the least recently used entry."""
+    _memory_cache[key] = vector
+    _memory_cache.move_to_end(key)
+    if len(_memory_cache) > EMBEDDING_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+def _lookup(key):
+    """Return the cached vector for key from either tier, or None. Caller holds _lock."""
+    vector = _memory_cache.get(key)
+    if vector is not None:
+        _memory_cache.move_to_end(key)
+        return vector
+
+    connection = _get_connection()
+    if connection is not None:
+        row = connection.execute(
+            "SELECT vector FROM embeddings WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        if row is not None:
+            vector = np.frombuffer(row[0], dtype=np.float16).astype(np.float32)
+            _remember(key, vector)
+            return vector
+    return None
+
+def _store(key, model, vector, ttl):
+    """Write vector to both tiers. Caller holds _lock."""
+    _remember(key, vector)
+    connection = _get_connection()
+    if connection is not None:
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, expires_at) VALUES (?, ?, ?, ?)",
+                (key, model, vector.astype(np.float16).tobytes(), time.time() + ttl)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Could not persist embedding: %s", e)
+
+def get_many_or_compute(texts, model, compute_many, ttl=DEFAULT_TTL):
+    """
+    Return embeddings for texts, calling compute_many once with all cache misses.
+
+    Args:
+        texts (list[str]): Texts to embed
+        model (str): Embedding model/deployment and dimensions, used to partition keys
+        compute_many (callable): Function taking a list of texts and returning their
+            embeddings in order; raise instead of returning fallbacks so failures are not cached
+        ttl (int): Seconds the persisted entries stay valid
+
+    Returns:
+        list[list]: One embedding vector per input text
+    """
+    keys = [cache_key(text, model) for text in texts]
+    found = {}
+
+    with _lock:
+        for key in keys:
+            if key not in found:
+                vector = _lookup(key)
+                if vector is not None:
+                    found[key] = vector
+
+    # Each distinct missing text is embedded once, in a single request
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+
+    if missing:
+        # Compute outside the lock so a slow embeddings call does not block other lookups
+        embeddings = compute_many(list(missing.values()))
+        with _lock:
+            for key, embedding in zip(missing, embeddings):
+                found[key] = np.asarray(embedding, dtype=np.float32)
+                _store(key, model, found[key], ttl)
+
+    return [found[key].tolist() for key in keys]
+
+def get_or_compute(text, model, compute, ttl=DEFAULT_TTL):
+    """
+    Return the embedding for text, calling compute(text) only on a cache miss.
+
+    Args:
+        text (str): Text to embed
+        model (str): Embedding model/deployment and dimensions, used to partition keys
+        compute (callable): Function returning the embedding as a sequence of floats;
+            raise instead of returning a fallback so failures are not cached
+        ttl (int): Seconds the persisted entry stays valid
+
+    Returns:
+        list: The embedding vector
+    """
+    return get_many_or_compute([text], model, lambda batch: [compute(batch[0])], ttl)[0]
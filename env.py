@@ -0,0 +1,30 @@
+"""
+Environment file loading shared by every module.
+
+Each .env file is parsed at most once per process, however many modules import
+it or how often a configuration helper runs. Variables already present in the
+environment are never overridden.
+"""
+import os
+import functools
+from dotenv import load_dotenv
+
+@functools.lru_cache(maxsize=None)
+def _load_once(path):
+    """Parse path into os.environ; cached per absolute path."""
+    return load_dotenv(path, override=False)
+
+def load_env(path="x1.env"):
+    """
+    Load the given .env file into os.environ once per process.
+    
+    Args:
+        path (str): Path to the .env file, relative to the working directory or absolute
+        
+    Returns:
+        bool: True if the file exists and was loaded (now or earlier)
+    """
+    # A missing file is not cached, so it is picked up once it appears
+    if not os.path.exists(path):
+        return False
+    return _load_once(os.path.abspath(path))
@@ -4,7 +4,7 @@ import random
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from faker import Faker
-from dotenv import load_dotenv
+from env import load_env
 from azure.cosmos import CosmosClient, PartitionKey
 from azure.identity import AzureCliCredential, ClientSecretCredential
 import h3  # Import H3 library
@@ -15,7 +15,7 @@ import time  # For sleep between geocoding requests
 fake = Faker()
 
 # Load environment variables from x1.env
-load_dotenv("x1.env")
+load_env("x1.env")
 
 # Get CosmosDB settings from environment variables
 COSMOS_ENDPOINT = os.getenv("COSMOS_ENDPOINT")
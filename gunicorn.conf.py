@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for the Flask web app.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+# The workflow endpoints mostly wait on Azure OpenAI, Cosmos DB and Redis, so
+# cooperative gevent workers keep many sessions in flight per process.
+# The gevent worker monkey-patches the standard library before loading app.py.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+# Without Redis the workflow state lives in each worker (signed cookie, SimpleCache),
+# so a request landing on another worker would silently lose the session
+if workers > 1 and not os.getenv("REDIS_URL"):
+    raise RuntimeError(
+        "GUNICORN_WORKERS > 1 requires REDIS_URL for shared sessions and cache; "
+        "set REDIS_URL or run with GUNICORN_WORKERS=1"
+    )
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Each request to OpenAI or Cosmos DB is bounded by OPENAI_TIMEOUT_SECONDS or
+# COSMOS_TIMEOUT_SECONDS (see clients.py); this is the last-resort bound on a
+# whole request, which may make several calls
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
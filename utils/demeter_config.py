@@ -3,11 +3,11 @@ Configuration for Demeter agent using Azure OpenAI o1-mini model.
 """
 
 import os
-from dotenv import load_dotenv
+from env import load_env
 
 # Load environment variables
 if os.path.exists("x1.env"):
-    load_dotenv("x1.env")
+    load_env("x1.env")
 
 # Demeter-specific Azure OpenAI configuration
 DEMETER_CONFIG = {
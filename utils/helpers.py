@@ -1,23 +1,43 @@
 import json
 import logging
+import orjson
 from typing import Dict, Any, Optional, List, Callable
 
 # Azure Best Practice: Configure module-level logger
 logger = logging.getLogger(__name__)
 
+def load_json(content):
+    """Parse JSON text or bytes with orjson, falling back to json for what only it accepts (e.g. NaN)"""
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return json.loads(content)
+
 def read_customer_data_from_file(file_path):
     """Read customer data from a file (JSON or text)"""
     try:
         with open(file_path, 'r') as f:
             content = f.read()
             try:
-                return json.loads(content)
+                return load_json(content)
             except json.JSONDecodeError:
                 return {"raw_input": content}
     except Exception as e:
         print(f"Error reading file: {e}")
         return None
 
+def parse_customer_data_bytes(content):
+    """Parse customer data from uploaded file bytes (JSON or text) without touching disk"""
+    try:
+        # orjson parses the uploaded bytes directly; only non-JSON uploads are decoded
+        return load_json(content)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        try:
+            return {"raw_input": content.decode('utf-8')}
+        except UnicodeDecodeError as e:
+            print(f"Error reading file: {e}")
+            return None
+
 def show_current_status_and_confirm(current_state, next_step):
     """
     Displays the current state and asks the user to confirm proceeding with the next step.
@@ -113,7 +133,7 @@ def extract_json_content(text: str) -> Optional[Dict[str, Any]]:
     # Define extraction strategies from most strict to most lenient
     strategies = [
         # Strategy 1: Direct JSON parsing
-        lambda t: json.loads(t),
+        load_json,
         
         # Strategy 2: Find content between triple backticks with json marker
         lambda t: json.loads(re.search(r'```json\s*(.*?)\s*```', t, re.DOTALL).group(1)),
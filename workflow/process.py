@@ -7,11 +7,15 @@ import json
 import uuid 
 import copy
 import re 
-from dotenv import load_dotenv
+import sys
+import math
+import orjson
+from collections import Counter
+from env import load_env
 from fsspec import Callback
-from openai import AzureOpenAI
+from clients import get_azure_client, COSMOS_CLIENT_OPTIONS
 from agents import initialize_agents
-from agents.hera import get_profile_recommendations
+from agents.hera import get_profile_recommendations, format_data_for_stage
 from workflow.document_processor import DocumentProcessor
 from utils.helpers import extract_json_content
 from db.cosmos_db import (
@@ -49,7 +53,7 @@ def initialize_azure_openai():
     # Load environment variables from x1.env
     if os.path.exists("x1.env"):
         logger.info("Loading environment variables from x1.env")
-        load_dotenv("x1.env")
+        load_env("x1.env")
     else:
         logger.error("Environment file x1.env not found.")
         return None
@@ -65,11 +69,7 @@ def initialize_azure_openai():
 
     try:
         # Initialize client
-        azure_openai_client = AzureOpenAI(
-            api_key=api_key,
-            api_version=api_version,
-            azure_endpoint=azure_endpoint
-        )
+        azure_openai_client = get_azure_client(api_key, azure_endpoint, api_version)
         # Test connection
         models = azure_openai_client.models.list()
         available_models = [model.id for model in models.data]
@@ -84,7 +84,7 @@ def initialize_azure_openai():
 
 
 
-from utils.helpers import read_customer_data_from_file, show_current_status_and_confirm, extract_json_content
+from utils.helpers import read_customer_data_from_file, parse_customer_data_bytes, show_current_status_and_confirm, extract_json_content, load_json
 ###
 
 
@@ -748,7 +748,7 @@ def extract_json_with_fallback(content):
         
         # Strategy 1: Direct JSON parsing if the content is already JSON
         try:
-            return json.loads(content)
+            return load_json(content)
         except json.JSONDecodeError:
             pass
         
@@ -836,6 +836,9 @@ def extract_json_with_fallback(content):
         logger.error(f"Error extracting JSON with fallback: {str(e)}")
         return None
     
+# "key": "value" string pairs, used by extract_customer_data_regex
+_JSON_STRING_FIELD_RE = re.compile(r'"(\w+)"\s*:\s*"([^"]+)"')
+
 def extract_customer_data_regex(data):
     """
     Direct regex extraction of customer data when JSON parsing fails.
@@ -844,35 +847,28 @@ def extract_customer_data_regex(data):
     try:
         result = {}
         
+        # One scan collects the first value of every "key": "value" string pair
+        fields = {}
+        for match in _JSON_STRING_FIELD_RE.finditer(data):
+            fields.setdefault(match.group(1), match.group(2))
+        
         # Extract name
-        name_match = re.search(r'"name"\s*:\s*"([^"]+)"', data)
-        if name_match:
-            result["name"] = name_match.group(1)
+        if "name" in fields:
+            result["name"] = fields["name"]
         
         # Extract DOB
-        dob_match = re.search(r'"(?:dateOfBirth|dob)"\s*:\s*"([^"]+)"', data)
-        if dob_match:
-            result["dob"] = dob_match.group(1)
+        dob = fields.get("dateOfBirth") or fields.get("dob")
+        if dob:
+            result["dob"] = dob
         
         # Extract address parts
-        address = {}
-        for field in ["street", "city", "state", "zip"]:
-            match = re.search(fr'"{field}"\s*:\s*"([^"]+)"', data)
-            if match:
-                address[field] = match.group(1)
+        address = {field: fields[field] for field in ("street", "city", "state", "zip") if field in fields}
         
         if address:
             result["address"] = address
             
         # Extract contact info
-        contact = {}
-        phone_match = re.search(r'"phone"\s*:\s*"([^"]+)"', data)
-        if phone_match:
-            contact["phone"] = phone_match.group(1)
-            
-        email_match = re.search(r'"email"\s*:\s*"([^"]+)"', data)
-        if email_match:
-            contact["email"] = email_match.group(1)
+        contact = {field: fields[field] for field in ("phone", "email") if field in fields}
             
         if contact:
             result["contact"] = contact
@@ -1045,10 +1041,10 @@ def check_azure_openai_deployments():
     """Verify Azure OpenAI deployments are available following Azure best practices"""
     try:
         # Create client from environment variables
-        client = AzureOpenAI(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+        client = get_azure_client(
+            os.getenv("AZURE_OPENAI_API_KEY"),
+            os.getenv("AZURE_OPENAI_ENDPOINT"),
+            os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
         )
         
         # List available deployments/models
@@ -1073,36 +1069,41 @@ def display_hera_recommendations(current_state, stage):
         current_state (dict): Current workflow state
         stage (str): The stage for which to display recommendations
     """
+    # Build the whole display and write it once instead of one print() per line
+    out = []
     if "hera_recommendations" in current_state and stage in current_state["hera_recommendations"]:
         recommendations = current_state["hera_recommendations"][stage]
         
-        print("\n=== RECOMMENDED COVERAGES FROM SIMILAR CUSTOMERS ===")
+        out.append("\n=== RECOMMENDED COVERAGES FROM SIMILAR CUSTOMERS ===\n")
         
         if "recommended_coverages" in recommendations:
             for idx, coverage in enumerate(recommendations["recommended_coverages"], 1):
-                print(f"\nRecommendation #{idx}:")
+                out.append(f"\nRecommendation #{idx}:\n")
                 
                 if coverage.get("coverages"):
-                    print(f"  Coverages: {', '.join(coverage['coverages'])}")
+                    out.append(f"  Coverages: {', '.join(coverage['coverages'])}\n")
                 
                 if coverage.get("limits"):
-                    print("  Limits:")
+                    out.append("  Limits:\n")
                     for limit_name, limit_value in coverage["limits"].items():
-                        print(f"    - {limit_name}: {limit_value}")
+                        out.append(f"    - {limit_name}: {limit_value}\n")
                 
                 if coverage.get("deductibles"):
-                    print("  Deductibles:")
+                    out.append("  Deductibles:\n")
                     for ded_name, ded_value in coverage["deductibles"].items():
-                        print(f"    - {ded_name}: {ded_value}")
+                        out.append(f"    - {ded_name}: {ded_value}\n")
                         
                 if coverage.get("premium") is not None:
-                    print(f"  Premium: ${coverage['premium']:.2f}")
+                    out.append(f"  Premium: ${coverage['premium']:.2f}\n")
         else:
-            print("No specific coverage recommendations available at this stage.")
+            out.append("No specific coverage recommendations available at this stage.\n")
             
-        print("\n===================================================\n")
+        out.append("\n===================================================\n\n")
     else:
-        print("\nNo recommendations available from Hera for this stage.\n")
+        out.append("\nNo recommendations available from Hera for this stage.\n\n")
+    
+    sys.stdout.write("".join(out))
+    sys.stdout.flush()
 
 def process_with_hera(current_state, stage):
     """
@@ -1132,7 +1133,7 @@ def process_with_hera(current_state, stage):
     current_state["hera_processed_stages"].append(stage_key)
     
     # Call Hera to get recommendations based on the current stage
-    recommendations = get_profile_recommendations(current_state, stage)
+    recommendations = get_profile_recommendations(format_data_for_stage(current_state, stage), stage)
     
     # Store recommendations in the workflow state
     if "hera_recommendations" not in current_state:
@@ -1163,10 +1164,10 @@ def call_customerprofile(customer_data):
     logger.info("Starting customer profile processing")
     try:
         # Import the module directly instead of using subprocess
-        from customerprofile import process_customer_data
+        from customerprofile import run as _profile_run
         
         # Call the function directly with the data
-        result = process_customer_data(customer_data)
+        result = _profile_run(customer_data)
         
         logger.info("Customer profile processing completed")
         return result
@@ -1179,7 +1180,8 @@ def parse_profile_output(output):
     Parse the output from customerprofile.py to extract match information
     
     Args:
-        output (str): Output from customerprofile.py
+        output (dict or str): Result of customerprofile.run(), or the JSON
+            customerprofile.py prints in script mode
         
     Returns:
         dict: Dictionary with matches and suggestion
@@ -1189,107 +1191,56 @@ def parse_profile_output(output):
         "suggestion": "No specific suggestion available based on the provided data."
     }
     
-    # Extract matches
-    match_sections = output.split("--- MATCH #")
+    if isinstance(output, dict):
+        profile_result = output
+    else:
+        try:
+            profile_result = orjson.loads(output)
+        except orjson.JSONDecodeError as e:
+            logger.error("Could not decode customerprofile output: %s", e)
+            return result
     
-    for i in range(1, len(match_sections)):
-        section = match_sections[i]
-        match = {}
-        
-        # Extract similarity
-        similarity_match = section.split("(Similarity: ")
-        if len(similarity_match) > 1:
-            similarity_str = similarity_match[1].split(")")[0]
-            try:
-                match["similarity"] = float(similarity_str)
-            except:
-                match["similarity"] = 0.0
-                
-        # Extract policy number
-        policy_match = section.split("Policy Number: ")
-        if len(policy_match) > 1:
-            match["policyNumber"] = policy_match[1].split("\n")[0].strip()
-            
-        # Extract coverages
-        coverage_match = section.split("Coverages: ")
-        if len(coverage_match) > 1:
-            coverages_str = coverage_match[1].split("\n")[0].strip()
-            match["coverages"] = [cov.strip() for cov in coverages_str.split(",")]
-            
-        # Extract add-ons
-        addon_match = section.split("Add-ons: ")
-        if len(addon_match) > 1:
-            addons_str = addon_match[1].split("\n")[0].strip()
-            match["addOns"] = [addon.strip() for addon in addons_str.split(",")]
-            
-        # Extract premium
-        premium_match = section.split("Premium: $")
-        if len(premium_match) > 1:
-            try:
-                premium_str = premium_match[1].split("\n")[0].strip()
-                match["premium"] = float(premium_str)
-            except:
-                pass
-                
-        # Extract limits
-        limits = {}
-        limits_section_match = section.split("Key Limits:")
-        if len(limits_section_match) > 1:
-            limits_section = limits_section_match[1].split("\n  Deductibles:")[0]
-            for line in limits_section.split("\n"):
-                if ":" in line:
-                    parts = line.strip().split(":", 1)
-                    if len(parts) == 2:
-                        key = parts[0].strip().replace("    ", "")
-                        value = parts[1].strip()
-                        limits[key] = value
-        
-        if limits:
-            match["limits"] = limits
-            
-        # Extract deductibles
-        deductibles = {}
-        deductibles_section_match = section.split("Deductibles:")
-        if len(deductibles_section_match) > 1:
-            deductibles_section = deductibles_section_match[1].split("\n\n")[0]
-            for line in deductibles_section.split("\n"):
-                if ":" in line:
-                    parts = line.strip().split(":", 1)
-                    if len(parts) == 2:
-                        key = parts[0].strip().replace("    ", "")
-                        value = parts[1].strip()
-                        deductibles[key] = value
+    for policy in profile_result.get("TOP_3_CLOSEST_POLICIES", []):
+        match = {
+            "similarity": policy.get("similarityScore", 0.0),
+            "policyNumber": policy.get("policyId"),
+            "coverages": policy.get("coverages", []),
+            "addOns": policy.get("addOns", [])
+        }
+        if policy.get("premium") is not None:
+            match["premium"] = policy["premium"]
+        if policy.get("limits"):
+            match["limits"] = policy["limits"]
+        if policy.get("deductibles"):
+            match["deductibles"] = policy["deductibles"]
         
-        if deductibles:
-            match["deductibles"] = deductibles
-                
         # Add match to results
         result["matches"].append(match)
     
     # Generate a suggestion based on the matches
     if result["matches"]:
-        # Count coverages to find most common
-        coverage_counter = {}
+        # One pass over the matches counts coverages and aggregates premiums
+        coverage_counter = Counter()
+        min_premium, max_premium, total_premium, premium_count = math.inf, -math.inf, 0.0, 0
         for match in result["matches"]:
-            for coverage in match.get("coverages", []):
-                if coverage in coverage_counter:
-                    coverage_counter[coverage] += 1
-                else:
-                    coverage_counter[coverage] = 1
-        
-        # Sort coverages by frequency
-        sorted_coverages = sorted(coverage_counter.items(), key=lambda x: x[1], reverse=True)
-        top_coverages = [cov for cov, _ in sorted_coverages[:5]]
+            coverage_counter.update(match.get("coverages", ()))
+            premium = match.get("premium")
+            if premium is not None:
+                if premium < min_premium:
+                    min_premium = premium
+                if premium > max_premium:
+                    max_premium = premium
+                total_premium += premium
+                premium_count += 1
+        top_coverages = [cov for cov, _ in coverage_counter.most_common(5)]
         
         # Generate suggestion
-        premiums = [match.get("premium", 0) for match in result["matches"] if "premium" in match]
-        
         suggestion = "Based on similar customer profiles, consider these popular coverages: "
         suggestion += ", ".join(top_coverages)
         
-        if premiums:
-            avg_premium = sum(premiums) / len(premiums)
-            suggestion += f". Typical premium range: ${min(premiums):.2f} - ${max(premiums):.2f}, averaging ${avg_premium:.2f}."
+        if premium_count:
+            avg_premium = total_premium / premium_count
+            suggestion += f". Typical premium range: ${min_premium:.2f} - ${max_premium:.2f}, averaging ${avg_premium:.2f}."
             
         result["suggestion"] = suggestion
     
@@ -4000,7 +3951,7 @@ def process_policy_activation(current_state, agents):
             if not endpoint or not key:
                 raise ValueError("Cosmos DB credentials (COSMOS_ENDPOINT, COSMOS_KEY) not found in environment variables.")
             
-            client = CosmosClient(endpoint, key)
+            client = CosmosClient(endpoint, key, **COSMOS_CLIENT_OPTIONS)
             database = client.get_database_client("insurance") # Assuming database name is 'insurance'
             container_client = database.create_container_if_not_exists(
                 id=container_name, 
@@ -4127,7 +4078,7 @@ def process_final_summary(current_state, agents):
         # Don't fail the entire workflow just because the summary failed
         return current_state
         
-def process_insurance_request(customer_file=None):
+def process_insurance_request(customer_file=None, customer_file_bytes=None, customer_filename=None):
     """
     Master workflow to process an insurance request from intake to issuance.
     
@@ -4136,6 +4087,9 @@ def process_insurance_request(customer_file=None):
     
     Args:
         customer_file (str, optional): Path to customer data file. Defaults to None.
+        customer_file_bytes (bytes, optional): Contents of an uploaded customer data file,
+            used instead of customer_file so uploads need not be written to disk. Defaults to None.
+        customer_filename (str, optional): Name of the uploaded file, for logging. Defaults to None.
         
     Returns:
         dict: Final policy summary or None if workflow was halted.
@@ -4171,16 +4125,20 @@ def process_insurance_request(customer_file=None):
         "hera_processed_stages": []  # Initialize to prevent recursion issues
     }
 
-    # Process customer file if provided
-    if customer_file:
-        print(f"Reading customer data from {customer_file}...")
-        file_data = read_customer_data_from_file(customer_file)
+    # Process customer file if provided, either uploaded in memory or by path
+    if customer_file_bytes is not None or customer_file:
+        source = customer_filename or customer_file or "uploaded file"
+        print(f"Reading customer data from {source}...")
+        if customer_file_bytes is not None:
+            file_data = parse_customer_data_bytes(customer_file_bytes)
+        else:
+            file_data = read_customer_data_from_file(customer_file)
         if file_data:
             current_state["file_data"] = file_data
-            logger.info(f"Successfully loaded customer data from {customer_file}")
+            logger.info(f"Successfully loaded customer data from {source}")
         else:
             print("Could not read customer data from file. Starting with manual intake.")
-            logger.warning(f"Failed to load customer data from {customer_file}")
+            logger.warning(f"Failed to load customer data from {source}")
 
     # ------- Execute each step in sequence --------
     
@@ -4428,7 +4386,7 @@ def handle_policy_change(initial_input):
             if not endpoint or not key:
                 raise ValueError("Cosmos DB credentials not found in environment variables")
                 
-            client = CosmosClient(endpoint, key)
+            client = CosmosClient(endpoint, key, **COSMOS_CLIENT_OPTIONS)
             database = client.get_database_client("insurance")
             container_client = database.create_container_if_not_exists(
                 id="PolicyIssued", 